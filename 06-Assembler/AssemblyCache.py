@@ -0,0 +1,167 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import filecmp
+import glob
+import hashlib
+import os
+import shutil
+import tempfile
+import typing
+
+# Bytes of the source hashed at a time, so that huge sources are never
+# read into memory whole.
+HASH_CHUNK_BYTES = 1 << 20
+
+
+class AssemblyCache:
+    """An on-disk cache of assembler outputs, keyed by content.
+
+    The key of an entry is a hash of the source text, the assembler options
+    (such as the output format) and a version stamp of the assembler itself,
+    so editing any assembler module invalidates every entry. The cache is
+    capped in size: whenever it grows past the cap, the least recently used
+    entries are evicted. Entries are written atomically, so several worker
+    processes may share one cache.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 256 << 20) -> None:
+        """Opens the cache directory, creating it if needed.
+
+        Args:
+            cache_dir (str): directory holding the cached outputs.
+            max_bytes (int): the size cap of the cache.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.version = AssemblyCache.version_stamp()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def version_stamp() -> str:
+        """
+        Returns:
+            str: a hash of the source of every assembler module.
+        """
+        digest = hashlib.sha256()
+        here = os.path.dirname(os.path.abspath(__file__))
+        for module_path in sorted(glob.glob(os.path.join(here, "*.py"))):
+            with open(module_path, "rb") as module_file:
+                digest.update(module_file.read())
+        return digest.hexdigest()
+
+    def key(self, source_file: typing.BinaryIO, variant: str) -> str:
+        """
+        Args:
+            source_file (typing.BinaryIO): the .asm file, opened in binary
+                mode. It is read in chunks of HASH_CHUNK_BYTES.
+            variant (str): the assembler options the entry is for.
+
+        Returns:
+            str: the cache key of the source.
+        """
+        digest = hashlib.sha256()
+        digest.update(self.version.encode("ascii"))
+        digest.update(variant.encode("utf-8") + b"\0")
+        for chunk in iter(lambda: source_file.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        """
+        Args:
+            key (str): a cache key.
+
+        Returns:
+            str: where the entry of the key is stored.
+        """
+        return os.path.join(self.cache_dir, key)
+
+    def restore(self, key: str, output_path: str) -> bool:
+        """Restores a cached output. The output file is left untouched if it
+        already holds the cached contents.
+
+        Args:
+            key (str): a cache key.
+            output_path (str): where the output should be.
+
+        Returns:
+            bool: True on a cache hit, False otherwise.
+        """
+        entry_path = self.entry_path(key)
+        try:
+            # Refreshing the modification time marks the entry as recently
+            # used, which is what eviction is ordered by.
+            os.utime(entry_path)
+        except FileNotFoundError:
+            return False
+        if not os.path.exists(output_path) or \
+                not filecmp.cmp(entry_path, output_path, shallow=False):
+            shutil.copyfile(entry_path, output_path)
+        return True
+
+    def store(self, key: str, output_path: str) -> None:
+        """Adds a freshly assembled output to the cache, then evicts entries
+        if the cache grew past its cap.
+
+        Args:
+            key (str): the cache key of the output's source.
+            output_path (str): the output file to cache.
+        """
+        temp_fd, temp_path = tempfile.mkstemp(dir=self.cache_dir,
+                                              suffix=".tmp")
+        os.close(temp_fd)
+        shutil.copyfile(output_path, temp_path)
+        os.replace(temp_path, self.entry_path(key))
+        self.evict()
+
+    def evict(self) -> None:
+        """Removes the least recently used entries until the cache fits in
+        its cap.
+        """
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as scan:
+            for entry in scan:
+                if entry.name.endswith(".tmp") or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def assemble(self, input_path: str, output_path: str, variant: str,
+                 assemble: typing.Callable[[], None]) -> bool:
+        """Produces the output of an input file, from the cache if possible.
+
+        Args:
+            input_path (str): the .asm file.
+            output_path (str): where the output should be.
+            variant (str): the assembler options, such as the output format.
+            assemble (typing.Callable[[], None]): assembles input_path into
+                output_path, called only on a cache miss.
+
+        Returns:
+            bool: True if the output came from the cache.
+        """
+        with open(input_path, "rb") as input_file:
+            key = self.key(input_file, variant)
+        if self.restore(key, output_path):
+            return True
+        assemble()
+        self.store(key, output_path)
+        return False
@@ -0,0 +1,242 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import concurrent.futures
+import glob
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+from Code import Code
+from Main import assemble_file, encode_single_pass
+from Parser import Parser
+from SymbolTable import SymbolTable
+
+try:
+    import resource
+except ImportError:  # Not available on Windows, peak RSS is then omitted.
+    resource = None
+
+# Number of instructions of every synthetic program.
+SIZES = (10000, 100000, 1000000)
+
+# The real programs, relative to this file.
+REAL_PROGRAMS = os.path.join(os.pardir, "04-Machine Language", "*", "*.asm")
+
+C_INSTRUCTIONS = ("D=M", "D=A", "M=D", "AM=M-1", "M=M+1", "D=D+M", "D=D-A",
+                  "A=M", "M=-1", "M=0", "D;JEQ", "D;JGT", "0;JMP", "D=D<<")
+
+
+def generate_program(instructions: int, label_density: float = 0.02,
+                     variable_density: float = 0.1,
+                     comment_density: float = 0.2,
+                     seed: int = 0) -> typing.Iterator[str]:
+    """Generates a synthetic, valid assembly program.
+
+    Args:
+        instructions (int): the number of instructions of the program.
+        label_density (float): labels per instruction. Half of the
+            A-instructions that are not variables refer to a label.
+        variable_density (float): the fraction of the instructions that
+            refer to a variable. There is one variable for every 10 such
+            references.
+        comment_density (float): comment lines per instruction, half of them
+            on lines of their own and half after an instruction.
+        seed (int): the seed of the generator, the same arguments always give
+            the same program.
+
+    Returns:
+        typing.Iterator[str]: the lines of the program.
+    """
+    generator = random.Random(seed)
+    labels = max(1, int(instructions * label_density))
+    variables = max(1, int(instructions * variable_density / 10))
+    label_every = max(1, instructions // labels)
+    for index in range(instructions):
+        if index % label_every == 0:
+            yield "(L%d)" % (index // label_every)
+        comment = ""
+        draw = generator.random()
+        if draw < comment_density / 2:
+            yield "// comment before instruction %d" % index
+        elif draw < comment_density:
+            comment = " // instruction %d" % index
+        draw = generator.random()
+        if draw < variable_density:
+            line = "@var%d" % generator.randrange(variables)
+        elif draw < 0.5:
+            if generator.random() < 0.5:
+                line = "@L%d" % generator.randrange(labels)
+            else:
+                line = "@%d" % generator.randrange(32768)
+        else:
+            line = generator.choice(C_INSTRUCTIONS)
+        yield "    " + line + comment
+
+
+def measure(path: str) -> typing.Dict[str, typing.Any]:
+    """Assembles a program and measures the time of each phase.
+
+    The whole assembly is measured first, so that its peak RSS is not raised
+    by the instruction list of the phases, and the cache of encoded
+    C-instructions is cleared before every measurement. The peak RSS is only
+    meaningful when every program is measured in a fresh process, as
+    run_benchmarks does.
+
+    Args:
+        path (str): path of the program.
+
+    Returns:
+        typing.Dict[str, typing.Any]: the results of the program.
+    """
+    seconds = {}
+    Code.clear_cache()
+    start = time.perf_counter()
+    assemble_file(path, io.StringIO(), rom_limit=None)
+    seconds["total"] = time.perf_counter() - start
+    # Kilobytes on Linux, bytes on macOS.
+    peak_rss = None if resource is None else \
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    with open(path, 'r') as input_file:
+        instructions = list(Parser(input_file))
+    seconds["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    symboltable = SymbolTable()
+    counter_code = 0
+    for instruction in instructions:
+        if instruction.command_type == "L_COMMAND":
+            symboltable.add_entry(instruction.symbol, counter_code)
+        else:
+            counter_code += 1
+    seconds["symbols"] = time.perf_counter() - start
+
+    Code.clear_cache()
+    start = time.perf_counter()
+    encode_single_pass(instructions, rom_limit=None)
+    seconds["encode"] = time.perf_counter() - start
+
+    with open(path, 'rb') as input_file:
+        lines = sum(1 for _ in input_file)
+    results = {
+        "lines": lines,
+        "instructions": counter_code,
+        "seconds": seconds,
+        "lines_per_second": lines / seconds["total"],
+    }
+    if peak_rss is not None:
+        results["peak_rss"] = peak_rss
+    return results
+
+
+def run_benchmarks(sizes: typing.Iterable[int], repeat: int = 1,
+                   seed: int = 0) -> typing.List[typing.Dict[str, typing.Any]]:
+    """Measures the synthetic programs of the given sizes and the real
+    programs, each one in a fresh process, and keeps the fastest of the
+    repetitions of every program.
+
+    Args:
+        sizes (typing.Iterable[int]): instruction counts of the synthetic
+            programs.
+        repeat (int): how many times to measure every program.
+        seed (int): seed of the synthetic programs.
+
+    Returns:
+        typing.List[typing.Dict[str, typing.Any]]: the results, one per
+        program.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        programs = []
+        for size in sizes:
+            path = os.path.join(temp_dir, "synthetic%d.asm" % size)
+            with open(path, 'w') as output_file:
+                output_file.writelines(line + "\n" for line in
+                                       generate_program(size, seed=seed))
+            programs.append(("synthetic-%d" % size, path))
+        for path in sorted(glob.glob(os.path.join(here, REAL_PROGRAMS))):
+            programs.append((os.path.basename(path), path))
+
+        for name, path in programs:
+            best = None
+            for _ in range(repeat):
+                with concurrent.futures.ProcessPoolExecutor(1) as executor:
+                    result = executor.submit(measure, path).result()
+                if best is None or result["seconds"]["total"] \
+                        < best["seconds"]["total"]:
+                    best = result
+            best["name"] = name
+            results.append(best)
+            print("%-20s %9d lines %12.0f lines/s" %
+                  (name, best["lines"], best["lines_per_second"]))
+    return results
+
+
+def git_commit() -> typing.Optional[str]:
+    """
+    Returns:
+        typing.Optional[str]: the commit of the working tree, if known.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+            check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: typing.List[typing.Dict[str, typing.Any]],
+            baseline: typing.List[typing.Dict[str, typing.Any]]) -> None:
+    """Prints the speedup of every program over a saved baseline run."""
+    baseline = {result["name"]: result for result in baseline}
+    for result in results:
+        if result["name"] in baseline:
+            print("%-20s %6.2fx" % (result["name"],
+                                    result["lines_per_second"] /
+                                    baseline[result["name"]]
+                                    ["lines_per_second"]))
+
+
+if "__main__" == __name__:
+    # Measures the assembler and saves the results as JSON, so that runs on
+    # different commits can be compared with --compare.
+    arg_parser = argparse.ArgumentParser(
+        prog="Benchmark",
+        usage="Benchmark [--sizes N ...] [--repeat N] [--seed N] "
+              "[--output FILE] [--compare FILE]")
+    arg_parser.add_argument("--sizes", type=int, nargs="*", default=SIZES,
+                            help="instructions of the synthetic programs")
+    arg_parser.add_argument("--repeat", type=int, default=1)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--output", default="benchmark.json")
+    arg_parser.add_argument("--compare", metavar="FILE",
+                            help="a previous output to compare with")
+    args = arg_parser.parse_args()
+    results = run_benchmarks(args.sizes, args.repeat, args.seed)
+    with open(args.output, 'w') as output_file:
+        json.dump({
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "results": results,
+        }, output_file, indent=2)
+        output_file.write("\n")
+    if args.compare:
+        with open(args.compare, 'r') as baseline_file:
+            compare(results, json.load(baseline_file)["results"])
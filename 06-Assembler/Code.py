@@ -7,6 +7,76 @@ Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
 
 
+# Lookup tables are built once, at import time, and shared by every call.
+DEST_TABLE = {
+    "null": "000",
+    "M": "001",
+    "D": "010",
+    "MD": "011",
+    "A": "100",
+    "AM": "101",
+    "AD": "110",
+    "AMD": "111"
+}
+
+COMP_TABLE = {
+    "0": "0101010",
+    "1": "0111111",
+    "-1": "0111010",
+    "D": "0001100",
+    "A": "0110000",
+    "M": "1110000",
+    "!D": "0001101",
+    "!A": "0110001",
+    "!M": "1110001",
+    "-D": "0001111",
+    "-A": "0110011",
+    "-M": "1110011",
+    "D+1": "0011111",
+    "A+1": "0110111",
+    "M+1": "1110111",
+    "D-1": "0001110",
+    "A-1": "0110010",
+    "M-1": "1110010",
+    "D+A": "0000010",
+    "D+M": "1000010",
+    "D-A": "0010011",
+    "D-M": "1010011",
+    "A-D": "0000111",
+    "M-D": "1000111",
+    "D&A": "0000000",
+    "D&M": "1000000",
+    "D|A": "0010101",
+    "D|M": "1010101",
+    "A<<": "1010100000",
+    "D<<": "1010110000",
+    "M<<": "1011100000",
+    "A>>": "1010000000",
+    "D>>": "1010010000",
+    "M>>": "1011000000"
+}
+
+JUMP_TABLE = {
+    "null": "000",
+    "JGT": "001",
+    "JEQ": "010",
+    "JGE": "011",
+    "JLT": "100",
+    "JNE": "101",
+    "JLE": "110",
+    "JMP": "111"
+}
+
+# Comp codes of the shift extension, which replace the "111" prefix.
+SHIFT_COMPS = frozenset(code for code in COMP_TABLE.values() if len(code) == 10)
+
+# Every 15-bit A-instruction value, rendered as a 16-bit word.
+A_WORDS = tuple(format(value, "016b") for value in range(1 << 15))
+
+# Encoded C-instruction words, keyed by their (dest, comp, jump) fields.
+_c_word_cache = {}
+
+
 class Code:
     """Translates Hack assembly language mnemonics into binary codes."""
     
@@ -19,17 +89,7 @@ class Code:
         Returns:
             str: 3-bit long binary code of the given mnemonic.
         """
-        dest_instruction_mapping = {
-            "null": "000",
-            "M": "001",
-            "D": "010",
-            "MD": "011",
-            "A": "100",
-            "AM": "101",
-            "AD": "110",
-            "AMD": "111"
-        }
-        return dest_instruction_mapping.get(mnemonic)
+        return DEST_TABLE.get(mnemonic)
 
     @staticmethod
     def comp(mnemonic: str) -> str:
@@ -40,43 +100,7 @@ class Code:
         Returns:
             str: the binary code of the given mnemonic.
         """
-        comp_instruction_mapping = {
-            "0": "0101010",
-            "1": "0111111",
-            "-1": "0111010",
-            "D": "0001100",
-            "A": "0110000",
-            "M": "1110000",
-            "!D": "0001101",
-            "!A": "0110001",
-            "!M": "1110001",
-            "-D": "0001111",
-            "-A": "0110011",
-            "-M": "1110011",
-            "D+1": "0011111",
-            "A+1": "0110111",
-            "M+1": "1110111",
-            "D-1": "0001110",
-            "A-1": "0110010",
-            "M-1": "1110010",
-            "D+A": "0000010",
-            "D+M": "1000010",
-            "D-A": "0010011",
-            "D-M": "1010011",
-            "A-D": "0000111",
-            "M-D": "1000111",
-            "D&A": "0000000",
-            "D&M": "1000000",
-            "D|A": "0010101",
-            "D|M": "1010101",
-            "A<<": "1010100000",
-            "D<<": "1010110000",
-            "M<<": "1011100000",
-            "A>>": "1010000000",
-            "D>>": "1010010000",
-            "M>>": "1011000000",
-        }
-        return comp_instruction_mapping .get(mnemonic)
+        return COMP_TABLE.get(mnemonic)
 
     @staticmethod
     def jump(mnemonic: str) -> str:
@@ -87,14 +111,53 @@ class Code:
         Returns:
             str: 3-bit long binary code of the given mnemonic.
         """
-        jump_instruction_mapping = {
-            "null": "000",
-            "JGT": "001",
-            "JEQ": "010",
-            "JGE": "011",
-            "JLT": "100",
-            "JNE": "101",
-            "JLE": "110",
-            "JMP": "111"
-        }
-        return jump_instruction_mapping.get(mnemonic)
+        return JUMP_TABLE.get(mnemonic)
+
+    @staticmethod
+    def c_instruction(dest: str, comp: str, jump: str) -> str:
+        """Encodes a whole C-instruction. Every distinct instruction is encoded
+        once, later occurrences are served from a cache.
+
+        Args:
+            dest (str): a dest mnemonic string.
+            comp (str): a comp mnemonic string.
+            jump (str): a jump mnemonic string.
+
+        Returns:
+            str: the 16-bit binary code of the instruction.
+        """
+        key = (dest, comp, jump)
+        word = _c_word_cache.get(key)
+        if word is None:
+            binary_dest = DEST_TABLE.get(dest)
+            binary_comp = COMP_TABLE.get(comp)
+            binary_jump = JUMP_TABLE.get(jump)
+            if binary_dest is None or binary_comp is None \
+                    or binary_jump is None:
+                raise ValueError("Invalid C-instruction: " + dest + "=" +
+                                 comp + ";" + jump)
+            if binary_comp in SHIFT_COMPS:
+                word = binary_comp + binary_dest + binary_jump
+            else:
+                word = "111" + binary_comp + binary_dest + binary_jump
+            _c_word_cache[key] = word
+        return word
+
+    @staticmethod
+    def clear_cache() -> None:
+        """Forgets every encoded C-instruction, so that the next ones are
+        encoded from scratch."""
+        _c_word_cache.clear()
+
+    @staticmethod
+    def a_instruction(value: int) -> str:
+        """
+        Args:
+            value (int): the value loaded by an A-instruction.
+
+        Returns:
+            str: the 16-bit binary code of the instruction.
+        """
+        if 0 <= value < 1 << 15:
+            return A_WORDS[value]
+        return format(min(max(value, 0), 0xFFFF), "016b")
@@ -0,0 +1,154 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import array
+import sys
+import typing
+
+
+class HackWriter:
+    """Writes assembled machine code in one of the supported output formats.
+
+    - "hack": the textual format of the book, one 16-bit binary string per line.
+    - "bin": raw little-endian 16-bit words.
+    - "hex": Intel HEX, with the words stored as little-endian byte pairs.
+    - "npy": a NumPy array file holding a one dimensional uint16 array.
+
+    Every writer emits its whole output with a single write call.
+    """
+
+    # Output format name -> (file extension, is the output a binary file).
+    FORMATS = {
+        "hack": (".hack", False),
+        "bin": (".bin", True),
+        "hex": (".hex", True),
+        "npy": (".npy", True),
+    }
+
+    @staticmethod
+    def write(words: typing.Iterable[str], output_file: typing.IO,
+              output_format: str = "hack") -> None:
+        """Writes the words in the given format.
+
+        Args:
+            words (typing.Iterable[str]): 16-bit binary strings, in ROM order.
+            output_file (typing.IO): a text file for "hack", a binary file for
+                every other format.
+            output_format (str): one of the keys of HackWriter.FORMATS.
+        """
+        if output_format == "hack":
+            HackWriter.write_hack(words, output_file)
+        elif output_format == "bin":
+            HackWriter.write_binary(words, output_file)
+        elif output_format == "hex":
+            HackWriter.write_intel_hex(words, output_file)
+        elif output_format == "npy":
+            HackWriter.write_npy(words, output_file)
+        else:
+            raise ValueError("Unknown output format: " + output_format)
+
+    @staticmethod
+    def to_array(words: typing.Iterable[str]) -> array.array:
+        """
+        Args:
+            words (typing.Iterable[str]): 16-bit binary strings.
+
+        Returns:
+            array.array: the words as an array of unsigned 16-bit integers.
+        """
+        return array.array("H", [int(word, 2) for word in words])
+
+    @staticmethod
+    def to_little_endian(words: typing.Iterable[str]) -> bytes:
+        """
+        Args:
+            words (typing.Iterable[str]): 16-bit binary strings.
+
+        Returns:
+            bytes: the words as consecutive little-endian byte pairs.
+        """
+        word_array = HackWriter.to_array(words)
+        if sys.byteorder == "big":
+            word_array.byteswap()
+        return word_array.tobytes()
+
+    @staticmethod
+    def write_hack(words: typing.Iterable[str],
+                   output_file: typing.TextIO) -> None:
+        """Writes one 16-bit binary string per line."""
+        output_file.writelines(word + "\n" for word in words)
+
+    @staticmethod
+    def write_binary(words: typing.Iterable[str],
+                     output_file: typing.BinaryIO) -> None:
+        """Writes raw little-endian 16-bit words."""
+        output_file.write(HackWriter.to_little_endian(words))
+
+    @staticmethod
+    def write_intel_hex(words: typing.Iterable[str],
+                        output_file: typing.BinaryIO) -> None:
+        """Writes an Intel HEX file of the words."""
+        output_file.write(HackWriter.intel_hex(
+            HackWriter.to_little_endian(words)).encode("ascii"))
+
+    @staticmethod
+    def intel_hex(data: bytes) -> str:
+        """Renders data as Intel HEX, with 16 data bytes per record. An
+        extended linear address record is emitted whenever the byte address
+        crosses a 64K boundary.
+
+        Args:
+            data (bytes): the bytes to render, loaded from address 0.
+
+        Returns:
+            str: the Intel HEX records, including the end of file record.
+        """
+        records = []
+        for offset in range(0, len(data), 16):
+            if offset and offset % 0x10000 == 0:
+                upper = offset >> 16
+                records.append(HackWriter.hex_record(
+                    0, 4, bytes((upper >> 8, upper & 0xFF))))
+            records.append(HackWriter.hex_record(
+                offset & 0xFFFF, 0, data[offset:offset + 16]))
+        records.append(HackWriter.hex_record(0, 1, b""))
+        return "".join(records)
+
+    @staticmethod
+    def hex_record(address: int, record_type: int, data: bytes) -> str:
+        """
+        Args:
+            address (int): the 16-bit load offset of the record.
+            record_type (int): 0 for data, 1 for end of file, 4 for an
+                extended linear address.
+            data (bytes): the record's payload.
+
+        Returns:
+            str: a single Intel HEX record, including its line break.
+        """
+        record = bytes((len(data), address >> 8, address & 0xFF,
+                        record_type)) + data
+        checksum = -sum(record) & 0xFF
+        return ":" + record.hex().upper() + format(checksum, "02X") + "\n"
+
+    @staticmethod
+    def write_npy(words: typing.Iterable[str],
+                  output_file: typing.BinaryIO) -> None:
+        """Writes a version 1.0 .npy file holding a little-endian uint16
+        array, which numpy.load reads without any conversion. NumPy itself is
+        not needed to write it.
+        """
+        data = HackWriter.to_little_endian(words)
+        header = "{'descr': '<u2', 'fortran_order': False, 'shape': (%d,), }" \
+                 % (len(data) // 2)
+        # Magic (6 bytes), version (2), header length (2), then the header,
+        # padded with spaces so the data starts on a 64-byte boundary.
+        padding = 63 - (10 + len(header)) % 64
+        header = header + " " * padding + "\n"
+        output_file.write(b"\x93NUMPY\x01\x00"
+                          + len(header).to_bytes(2, "little")
+                          + header.encode("latin1") + data)
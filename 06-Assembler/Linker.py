@@ -0,0 +1,69 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from Code import Code
+from ObjectFile import ObjectFile
+from RomReport import ROM_SIZE, RomReport
+from SymbolTable import SymbolTable
+
+
+class Linker:
+    """Links object files into a single program. The modules are placed in
+    ROM one after the other, in the given order, and the result is the same
+    as assembling the concatenation of their sources.
+    """
+
+    def __init__(self, objects: typing.Iterable[ObjectFile]) -> None:
+        """Creates a linker.
+
+        Args:
+            objects (typing.Iterable[ObjectFile]): the modules, in ROM order.
+        """
+        self.objects = list(objects)
+        self.symboltable = SymbolTable()
+
+    def link(self, rom_limit: typing.Optional[int] = ROM_SIZE
+             ) -> typing.List[str]:
+        """Links the modules. Afterwards, the symbol table holds the labels
+        of all modules and the variables of the program.
+
+        Args:
+            rom_limit (int): the largest allowed program, None for no limit.
+
+        Returns:
+            typing.List[str]: the encoded words, as 16-bit binary strings.
+        """
+        bases = []
+        size = 0
+        for module in self.objects:
+            bases.append(size)
+            for label, address in module.labels.items():
+                if self.symboltable.contains(label):
+                    raise ValueError("Duplicate label: " + label)
+                self.symboltable.add_entry(label, size + address)
+            size += len(module.code)
+        RomReport.check(self.symboltable.items(), size, rom_limit)
+
+        words = []
+        rom = 16
+        for base, module in zip(bases, self.objects):
+            code = list(module.code)
+            for index in module.relocations:
+                code[index] += base
+            # Variables are allocated in order of first reference, exactly as
+            # the assembler does for a single module.
+            for index, symbol in module.externals:
+                address = self.symboltable.get_address(symbol)
+                if address is None:
+                    address = rom
+                    self.symboltable.add_entry(symbol, address)
+                    rom += 1
+                code[index] = address
+            words.extend(code)
+        return [Code.a_instruction(word) if word < 0x8000
+                else format(word, "016b") for word in words]
@@ -5,87 +5,498 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import array
+import collections
+import concurrent.futures
+import itertools
 import os
 import sys
 import typing
-from SymbolTable import SymbolTable
-from Parser import Parser
+from SymbolTable import PREDEFINED_SYMBOLS, SymbolTable
+from Parser import Instruction, Parser
+from Peephole import Peephole
+from RomReport import ROM_SIZE, RomOverflowError, RomReport
+from SymbolMap import SymbolMap
+from AssemblyCache import AssemblyCache
 from Code import Code
+from HackWriter import HackWriter
+from MappedFile import MappedFile
+from Linker import Linker
+from ObjectFile import ObjectFile
+from VectorAssembler import VectorAssembler
 
+# Lines per chunk of the chunked pass two, see assemble_chunked. Smaller
+# chunks cost more round trips to the workers than they save.
+MIN_CHUNK_LINES = 20000
 
-def is_shift(input_string: str) -> bool:
-    """Checks if a given binary computation pattern corresponds to a shift operation."""
-    valid_patterns = {"1010100000", "1010110000", "1011100000", "1010000000", "1010010000", "1011000000"}
-    return input_string in valid_patterns
+# Smaller programs are encoded serially by assemble_chunked, since starting
+# the workers costs more than the parallel encoding saves.
+MIN_PARALLEL_INSTRUCTIONS = 200000
 
-
-def translate_to_binary(a) -> str:
-    """Converts a given integer value to a 16-bit binary string."""
-    a_temp = int(a)
-    str_ = ""
-    for i in range(15, -1, -1):
-        b = pow(2, i)
-        if b <= a_temp:
-            str_ += "1"
-            a_temp = a_temp - b
-        else:
-            str_ += "0"
-    return str_
+# The frozen symbol table of a chunk worker process, see assemble_chunked.
+_chunk_symbols: typing.Dict[str, int] = {}
 
 
-def assemble_file(input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+def assemble_file(input_file: typing.Union[typing.TextIO, str],
+                  output_file: typing.IO,
+                  single_pass: bool = False,
+                  output_format: str = "hack",
+                  vectorized: bool = False,
+                  optimize: bool = False,
+                  map_file: typing.Optional[typing.TextIO] = None,
+                  map_format: str = "text",
+                  rom_limit: typing.Optional[int] = ROM_SIZE,
+                  size_report: bool = False,
+                  object_file: bool = False,
+                  jobs: int = 1) -> None:
     """Assembles a single file.
 
     Args:
-        input_file (typing.TextIO): the file to assemble.
-        output_file (typing.TextIO): writes all output to this file.
+        input_file (typing.Union[typing.TextIO, str]): the file to assemble,
+            or its path. A path is memory-mapped and scanned line by line,
+            see MappedFile, so huge inputs are never held in memory whole.
+        output_file (typing.IO): writes all output to this file. It must be
+            opened in binary mode for every output format except "hack".
+        single_pass (bool): encode every instruction during one read of the
+            input and backpatch forward label references at the end. This is
+            also used automatically when the input cannot seek (pipes, stdin).
+        output_format (str): one of the formats of HackWriter.FORMATS.
+        vectorized (bool): assemble the whole file at once with the NumPy
+            backend, see VectorAssembler.
+        optimize (bool): run the Peephole optimizer before encoding, and
+            print how many times each of its patterns applied to stderr.
+        map_file (typing.TextIO): if given, the SymbolMap of the program is
+            written to this file.
+        map_format (str): one of the formats of SymbolMap.FORMATS.
+        rom_limit (int): the largest allowed program, in words. A larger
+            program raises RomOverflowError, listing its largest regions,
+            before any output is written. None disables the check.
+        size_report (bool): print the RomReport of the program to stderr.
+        object_file (bool): write a relocatable ObjectFile, to be linked with
+            other modules by link_paths, instead of a program. The output
+            file must be opened in text mode.
+        jobs (int): if more than 1, encode the second pass in chunks on this
+            many worker processes, see assemble_chunked.
+    """
+    if isinstance(input_file, str):
+        with MappedFile(input_file) as mapped_file:
+            assemble_file(mapped_file, output_file, single_pass, output_format,
+                          vectorized, optimize, map_file, map_format,
+                          rom_limit, size_report, object_file, jobs)
+        return
+    source_name = getattr(input_file, "name", "<input>")
+    if object_file:
+        if vectorized or optimize or map_file is not None or size_report:
+            raise ValueError("Object files cannot be vectorized, optimized, "
+                             "or have symbol maps and size reports")
+        ObjectFile.from_instructions(Parser(input_file)).write(output_file)
+        return
+    if optimize or map_file is not None or size_report:
+        if vectorized:
+            raise ValueError("The vectorized backend cannot optimize or "
+                             "write symbol maps and size reports")
+        instructions = list(Parser(input_file))
+        if optimize:
+            peephole = Peephole()
+            instructions = peephole.optimize(instructions)
+            print(source_name + ":\n" + peephole.report(), file=sys.stderr)
+        symboltable = SymbolTable()
+        words = encode_single_pass(instructions, symboltable, rom_limit)
+        if size_report:
+            print(source_name + ": " +
+                  RomReport.from_instructions(instructions).format(),
+                  file=sys.stderr)
+        HackWriter.write(words, output_file, output_format)
+        if map_file is not None:
+            SymbolMap(instructions, symboltable).write(map_file, map_format)
+        return
+    if vectorized:
+        VectorAssembler.write(VectorAssembler.assemble(input_file, rom_limit),
+                              output_file, output_format)
+        return
+    if single_pass or not input_file.seekable():
+        words = assemble_single_pass(input_file, rom_limit)
+    elif jobs > 1:
+        words = assemble_chunked(input_file, jobs, rom_limit)
+    else:
+        words = assemble_two_pass(input_file, rom_limit)
+    HackWriter.write(words, output_file, output_format)
+
+
+def assemble_two_pass(input_file: typing.TextIO,
+                      rom_limit: typing.Optional[int] = ROM_SIZE
+                      ) -> typing.Iterator[str]:
+    """Assembles a single file by reading it twice: the first pass records
+    the labels, the second one encodes the instructions.
+
+    Args:
+        input_file (typing.TextIO): the file to assemble, must be seekable.
+        rom_limit (int): see assemble_file. The size is checked right after
+            the first pass.
+
+    Returns:
+        typing.Iterator[str]: the encoded words, produced while the second
+        pass reads the input.
     """
-    parser_first = Parser(input_file)
     symboltable = SymbolTable()
-    text = ""
     counter_code = 0
 
-    while parser_first.has_more_commands():
-        symb = parser_first.command_type()
-        if symb == "L_COMMAND":
-            l_command = parser_first.symbol()
-            symboltable.add_entry(l_command, counter_code)
-        elif symb == "C_COMMAND" or symb == "A_COMMAND":
+    for instruction in Parser(input_file):
+        if instruction.command_type == "L_COMMAND":
+            symboltable.add_entry(instruction.symbol, counter_code)
+        else:
             counter_code += 1
-        parser_first.advance()
+    RomReport.check(symboltable.items(), counter_code, rom_limit)
     rom = 16
     input_file.seek(0)
-    parser_second = Parser(input_file)
-    while parser_second.has_more_commands():
-        symb = parser_second.command_type()
+    for instruction in Parser(input_file):
+        symb = instruction.command_type
         if symb == "C_COMMAND":
-            binary_dest = Code.dest(parser_second.dest())
-            binary_comp = Code.comp(parser_second.comp())
-            binary_jump = Code.jump(parser_second.jump())
-            if is_shift(binary_comp):
-                binary = str(binary_comp) + str(binary_dest) + str(binary_jump)
-            else:
-                binary = "111" + str(binary_comp) + str(binary_dest) + str(binary_jump)
+            binary = Code.c_instruction(instruction.dest, instruction.comp,
+                                        instruction.jump)
         elif symb == "A_COMMAND":
-            a_command = parser_second.symbol()
-            if symboltable.contains(a_command):
-                address = symboltable.get_address(a_command)
-                binary = translate_to_binary(address)
+            a_command = instruction.symbol
+            address = symboltable.get_address(a_command)
+            if address is not None:
+                binary = Code.a_instruction(address)
+            elif a_command.isnumeric():
+                binary = Code.a_instruction(int(a_command))
             else:
-                if a_command.isnumeric():
-                    binary = translate_to_binary(a_command)
-                else:
-                    symboltable.add_entry(a_command, rom)
-                    address = symboltable.get_address(a_command)
-                    binary = translate_to_binary(address)
-                    rom += 1
+                symboltable.add_entry(a_command, rom)
+                binary = Code.a_instruction(rom)
+                rom += 1
         else:
-            parser_second.advance()
             continue
-        text = text + str(binary) + "\n"
-        parser_second.advance()
+        yield binary
+
+
+def assemble_chunked(input_file: typing.TextIO, jobs: int,
+                     rom_limit: typing.Optional[int] = ROM_SIZE
+                     ) -> typing.Iterator[str]:
+    """Assembles a single huge file, encoding its second pass in parallel.
+
+    The first pass records the labels and, in order of first reference, every
+    other symbol that is not predefined. The symbols that turn out not to be
+    labels are the variables, and allocating them from RAM[16] in that order
+    gives them the same addresses as the two-pass assembler does. The symbol
+    table is then complete, so the second pass reads the lines in contiguous
+    chunks that worker processes encode independently, and the encoded chunks
+    are yielded in order. Only a few chunks are in flight at a time, so the
+    file is never held in memory whole.
+
+    Starting the workers and sending them the lines only pays off for large
+    programs, so programs of fewer than MIN_PARALLEL_INSTRUCTIONS
+    instructions, or machines with a single CPU, are encoded serially.
+
+    Args:
+        input_file (typing.TextIO): the file to assemble, must be seekable.
+        jobs (int): number of worker processes, at most one per CPU is used.
+        rom_limit (int): see assemble_file.
+
+    Returns:
+        typing.Iterator[str]: the encoded words.
+    """
+    symboltable = SymbolTable()
+    referenced = {}
+    counter_code = 0
+    for instruction in Parser(input_file):
+        if instruction.command_type == "L_COMMAND":
+            symboltable.add_entry(instruction.symbol, counter_code)
+            continue
+        counter_code += 1
+        symbol = instruction.symbol
+        if symbol is not None and not symbol.isnumeric():
+            referenced.setdefault(symbol, None)
+    RomReport.check(symboltable.items(), counter_code, rom_limit)
+    rom = 16
+    for symbol in referenced:
+        if not symboltable.contains(symbol):
+            symboltable.add_entry(symbol, rom)
+            rom += 1
+
+    # Workers receive the table once, as a plain dict, instead of per chunk.
+    symbols = dict(PREDEFINED_SYMBOLS)
+    symbols.update(symboltable.items())
+    input_file.seek(0)
+    jobs = min(jobs, os.cpu_count() or 1)
+    if jobs <= 1 or counter_code < MIN_PARALLEL_INSTRUCTIONS:
+        init_chunk_worker(symbols)
+        yield from encode_chunk(input_file)
+        return
+    # Every line holds about one instruction, which is close enough to
+    # balance the chunks.
+    chunk_lines = max(MIN_CHUNK_LINES, -(-counter_code // (jobs * 4)))
+    with concurrent.futures.ProcessPoolExecutor(
+            jobs, initializer=init_chunk_worker,
+            initargs=(symbols,)) as executor:
+        pending = collections.deque()
+        while True:
+            chunk = list(itertools.islice(input_file, chunk_lines))
+            if chunk:
+                pending.append(executor.submit(encode_chunk, chunk))
+            if pending and (not chunk or len(pending) > jobs):
+                yield from pending.popleft().result()
+            elif not chunk:
+                return
+
+
+def init_chunk_worker(symbols: typing.Dict[str, int]) -> None:
+    """Installs the frozen symbol table of a chunk worker process."""
+    global _chunk_symbols
+    _chunk_symbols = symbols
+
+
+def encode_chunk(lines: typing.Iterable[str]) -> typing.List[str]:
+    """Encodes a chunk of lines with the table set by init_chunk_worker.
+
+    Args:
+        lines (typing.Iterable[str]): contiguous lines of the source.
+
+    Returns:
+        typing.List[str]: the encoded words of the chunk.
+    """
+    symbols = _chunk_symbols
+    a_instruction = Code.a_instruction
+    c_instruction = Code.c_instruction
+    words = []
+    for instruction in Parser.parse_lines(lines):
+        command_type = instruction.command_type
+        if command_type == "C_COMMAND":
+            words.append(c_instruction(instruction.dest, instruction.comp,
+                                       instruction.jump))
+        elif command_type == "A_COMMAND":
+            address = symbols.get(instruction.symbol)
+            if address is None:
+                address = int(instruction.symbol)
+            words.append(a_instruction(address))
+    return words
+
+
+def assemble_single_pass(input_file: typing.TextIO,
+                         rom_limit: typing.Optional[int] = ROM_SIZE
+                         ) -> typing.List[str]:
+    """Assembles a single file while reading it only once.
+
+    Instructions are encoded as they are parsed. An A-instruction whose symbol
+    is not known yet is recorded in a fixup list, since it may be a label that
+    is defined further down. Once the input is exhausted, every fixup is
+    patched: labels get their ROM address, and the remaining symbols are
+    allocated as variables in order of first reference, exactly like the
+    two-pass assembler does.
+
+    Args:
+        input_file (typing.TextIO): the file to assemble, need not be seekable.
+        rom_limit (int): see assemble_file.
+
+    Returns:
+        typing.List[str]: the encoded words.
+    """
+    return encode_single_pass(Parser(input_file), rom_limit=rom_limit)
+
+
+def encode_single_pass(instructions: typing.Iterable[Instruction],
+                       symboltable: typing.Optional[SymbolTable] = None,
+                       rom_limit: typing.Optional[int] = ROM_SIZE
+                       ) -> typing.List[str]:
+    """Encodes parsed instructions in a single pass, see assemble_single_pass.
+
+    Args:
+        instructions (typing.Iterable[Instruction]): the program.
+        symboltable (SymbolTable): the table to fill with the labels and
+            variables of the program, a new one if not given.
+        rom_limit (int): see assemble_file.
+
+    Returns:
+        typing.List[str]: the encoded words.
+    """
+    if symboltable is None:
+        symboltable = SymbolTable()
+    words = []
+    fixups = []
+
+    for instruction in instructions:
+        symb = instruction.command_type
+        if symb == "C_COMMAND":
+            words.append(Code.c_instruction(instruction.dest,
+                                            instruction.comp,
+                                            instruction.jump))
+        elif symb == "A_COMMAND":
+            a_command = instruction.symbol
+            address = symboltable.get_address(a_command)
+            if address is not None:
+                words.append(Code.a_instruction(address))
+            elif a_command.isnumeric():
+                words.append(Code.a_instruction(int(a_command)))
+            else:
+                fixups.append((len(words), a_command))
+                words.append(None)
+        else:
+            symboltable.add_entry(instruction.symbol, len(words))
+
+    # Only labels are in the table until the fixups allocate variables.
+    RomReport.check(symboltable.items(), len(words), rom_limit)
+    rom = 16
+    for index, a_command in fixups:
+        address = symboltable.get_address(a_command)
+        if address is None:
+            address = rom
+            symboltable.add_entry(a_command, address)
+            rom += 1
+        words[index] = Code.a_instruction(address)
+
+    return words
 
-    output_file.write(text)
+
+def assemble(source: typing.Union[str, typing.Iterable[str]],
+             rom_limit: typing.Optional[int] = ROM_SIZE
+             ) -> typing.Tuple[array.array, SymbolTable]:
+    """Assembles a program in memory, without touching the filesystem.
+
+    Args:
+        source (typing.Union[str, typing.Iterable[str]]): the whole program
+            as a single string, or any iterable of its lines.
+        rom_limit (int): see assemble_file.
+
+    Returns:
+        typing.Tuple[array.array, SymbolTable]: the encoded words, as an
+        array of unsigned 16-bit integers that can be loaded straight into
+        the ROM of an emulator, and the symbol table holding the labels and
+        variables of the program.
+    """
+    if isinstance(source, str):
+        source = source.splitlines()
+    symboltable = SymbolTable()
+    words = encode_single_pass(Parser(source), symboltable, rom_limit)
+    return HackWriter.to_array(words), symboltable
+
+
+def assemble_path(input_path: str,
+                  cache: typing.Optional[AssemblyCache] = None,
+                  **options) -> str:
+    """Assembles the file at the given path, writing the output next to it.
+
+    Args:
+        input_path (str): path of the .asm file to assemble.
+        cache (AssemblyCache): if given, unchanged inputs are served from this
+            cache instead of being assembled again. The cache is not used when
+            a symbol map, a size report or the statistics of the optimizer
+            are requested, since only the output file is cached.
+        **options: keyword arguments of assemble_file, except map_file. If
+            map_format is given, the symbol map is written next to the input.
+
+    Returns:
+        str: the path of the output file.
+    """
+    output_format = options.get("output_format", "hack")
+    output_extension, is_binary = HackWriter.FORMATS[output_format]
+    if options.get("object_file"):
+        output_extension, is_binary = ObjectFile.EXTENSION, False
+    output_name = os.path.splitext(input_path)[0]
+    output_path = output_name + output_extension
+    map_format = options.get("map_format")
+
+    def assemble() -> None:
+        try:
+            with open(output_path, 'wb' if is_binary else 'w') \
+                    as output_file:
+                if map_format is None:
+                    assemble_file(input_path, output_file, **options)
+                    return
+                map_path = output_name + SymbolMap.FORMATS[map_format]
+                with open(map_path, 'w') as map_file:
+                    assemble_file(input_path, output_file, map_file=map_file,
+                                  **options)
+        except Exception:
+            # Do not leave a truncated output behind.
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise
+
+    if cache is None or map_format is not None or options.get("optimize") \
+            or options.get("size_report"):
+        assemble()
+    else:
+        # The number of workers does not change the output.
+        variant = repr(sorted((name, value)
+                              for name, value in options.items()
+                              if name != "jobs"))
+        cache.assemble(input_path, output_path, variant, assemble)
+    return output_path
+
+
+def link_paths(object_paths: typing.List[str], output_path: str,
+               output_format: str = "hack",
+               rom_limit: typing.Optional[int] = ROM_SIZE) -> None:
+    """Links object files into a program, see Linker.
+
+    Args:
+        object_paths (typing.List[str]): paths of the object files, in the
+            order their code is placed in ROM.
+        output_path (str): path of the program to write.
+        output_format (str): one of the formats of HackWriter.FORMATS.
+        rom_limit (int): see assemble_file.
+    """
+    objects = []
+    for object_path in object_paths:
+        with open(object_path, 'r') as object_file:
+            objects.append(ObjectFile.read(object_file))
+    words = Linker(objects).link(rom_limit)
+    is_binary = HackWriter.FORMATS[output_format][1]
+    with open(output_path, 'wb' if is_binary else 'w') as output_file:
+        HackWriter.write(words, output_file, output_format)
+
+
+def try_assemble_path(input_path: str, cache: typing.Optional[AssemblyCache],
+                      options: typing.Dict[str, typing.Any]
+                      ) -> typing.Optional[str]:
+    """Runs assemble_path in a worker process, so that a single bad file does
+    not abort the rest of the batch.
+
+    Returns:
+        typing.Optional[str]: None on success, otherwise a description of the
+        error.
+    """
+    try:
+        assemble_path(input_path, cache, **options)
+    except Exception as error:
+        return type(error).__name__ + ": " + str(error)
+    return None
+
+
+def assemble_in_parallel(input_paths: typing.List[str], jobs: int,
+                         cache: typing.Optional[AssemblyCache] = None,
+                         **options) -> typing.Dict[str, str]:
+    """Assembles many files on a pool of worker processes. Progress is printed
+    in the order of input_paths, no matter which worker finishes first.
+
+    Args:
+        input_paths (typing.List[str]): paths of the .asm files to assemble.
+        jobs (int): number of worker processes.
+        cache (AssemblyCache): see assemble_path.
+        **options: keyword arguments of assemble_file.
+
+    Returns:
+        typing.Dict[str, str]: the error of every file that failed, keyed by
+        its path.
+    """
+    errors = {}
+    total = len(input_paths)
+    # Hand out files in batches, so thousands of small files do not cost a
+    # round trip to the pool each.
+    chunksize = max(1, total // (jobs * 4))
+    with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+        results = executor.map(try_assemble_path, input_paths,
+                               itertools.repeat(cache),
+                               itertools.repeat(options),
+                               chunksize=chunksize)
+        for done, (input_path, error) in enumerate(zip(input_paths, results),
+                                                   1):
+            status = "ok" if error is None else "FAILED"
+            print("[%d/%d] %s: %s" % (done, total, input_path, status))
+            if error is not None:
+                errors[input_path] = error
+    return errors
 
 
 if "__main__" == __name__:
@@ -94,20 +505,90 @@ if "__main__" == __name__:
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: Assembler <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
-    if os.path.isdir(argument_path):
-        files_to_assemble = [
-            os.path.join(argument_path, filename)
-            for filename in os.listdir(argument_path)]
+    # An input path of "-" assembles stdin to stdout in a single pass.
+    # With --object, every .asm file becomes a relocatable .obj file instead,
+    # and --link combines the .obj files of the input paths into one program.
+    arg_parser = argparse.ArgumentParser(
+        prog="Assembler",
+        usage="Assembler [--single-pass | --vectorized] [--optimize] "
+              "[--format FORMAT] [--map FORMAT] [--size-report] "
+              "[--rom-limit WORDS] [--jobs N] [--cache DIR [--cache-size MB]] "
+              "[--object | --link OUTPUT] <input path>...")
+    arg_parser.add_argument("paths", nargs="+")
+    arg_parser.add_argument("--object", action="store_true",
+                            help="write relocatable .obj files")
+    arg_parser.add_argument("--link", metavar="OUTPUT",
+                            help="link the input .obj files into OUTPUT")
+    arg_parser.add_argument("--single-pass", action="store_true")
+    arg_parser.add_argument("--vectorized", action="store_true",
+                            help="use the NumPy backend")
+    arg_parser.add_argument("--optimize", action="store_true",
+                            help="run the peephole optimizer")
+    arg_parser.add_argument("--map", choices=list(SymbolMap.FORMATS),
+                            help="also write a symbol map")
+    arg_parser.add_argument("--size-report", action="store_true",
+                            help="print the code size of every label region")
+    arg_parser.add_argument("--rom-limit", type=int, default=ROM_SIZE,
+                            metavar="WORDS",
+                            help="fail on larger programs, 0 for no limit")
+    arg_parser.add_argument("--format", default="hack",
+                            choices=list(HackWriter.FORMATS))
+    arg_parser.add_argument("--jobs", type=int, default=1,
+                            help="worker processes, 0 for one per CPU")
+    arg_parser.add_argument("--cache", metavar="DIR",
+                            help="reuse outputs of unchanged inputs")
+    arg_parser.add_argument("--cache-size", type=int, default=256,
+                            metavar="MB", help="size cap of the cache")
+    args = arg_parser.parse_args()
+    options = {"single_pass": args.single_pass, "output_format": args.format,
+               "vectorized": args.vectorized, "optimize": args.optimize,
+               "rom_limit": args.rom_limit or None,
+               "size_report": args.size_report}
+    if args.object:
+        options["object_file"] = True
+    if args.map:
+        options["map_format"] = args.map
+    cache = None
+    if args.cache:
+        cache = AssemblyCache(args.cache, args.cache_size << 20)
+    if args.paths == ["-"]:
+        is_binary = HackWriter.FORMATS[args.format][1]
+        output_file = sys.stdout.buffer if is_binary else sys.stdout
+        options["single_pass"] = True
+        assemble_file(sys.stdin, output_file, **options)
+        sys.exit()
+    input_paths = []
+    for argument_path in map(os.path.abspath, args.paths):
+        if os.path.isdir(argument_path):
+            input_paths.extend(
+                os.path.join(argument_path, filename)
+                for filename in sorted(os.listdir(argument_path)))
+        else:
+            input_paths.append(argument_path)
+    if args.link:
+        link_paths([input_path for input_path in input_paths
+                    if os.path.splitext(input_path)[1].lower()
+                    == ObjectFile.EXTENSION],
+                   args.link, args.format, args.rom_limit or None)
+        sys.exit()
+    files_to_assemble = [
+        input_path for input_path in input_paths
+        if os.path.splitext(input_path)[1].lower() == ".asm"]
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+    if jobs > 1 and len(files_to_assemble) == 1:
+        # A single file is split into chunks instead.
+        options["jobs"] = jobs
+    if jobs > 1 and len(files_to_assemble) > 1:
+        failed = assemble_in_parallel(files_to_assemble, jobs, cache,
+                                      **options)
+        for input_path, error in failed.items():
+            print(input_path + ": " + error, file=sys.stderr)
+        if failed:
+            sys.exit("%d of %d files failed to assemble"
+                     % (len(failed), len(files_to_assemble)))
     else:
-        files_to_assemble = [argument_path]
-    for input_path in files_to_assemble:
-        filename, extension = os.path.splitext(input_path)
-        if extension.lower() != ".asm":
-            continue
-        output_path = filename + ".hack"
-        with open(input_path, 'r') as input_file, \
-                open(output_path, 'w') as output_file:
-            assemble_file(input_file, output_file)
+        for input_path in files_to_assemble:
+            try:
+                assemble_path(input_path, cache, **options)
+            except RomOverflowError as error:
+                sys.exit(input_path + ": " + str(error))
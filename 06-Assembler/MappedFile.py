@@ -0,0 +1,91 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import mmap
+import typing
+
+
+class MappedFile:
+    """A read-only source file that is memory-mapped instead of read. It can
+    be used wherever the assembler expects an input text file.
+
+    Iterating over it scans the mapping for line breaks and decodes one line
+    at a time, so neither the decoded text nor a list of its lines is ever
+    held in memory. The pages of the mapping belong to the OS page cache, and
+    are shared between both passes of the assembler.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Maps the file at the given path.
+
+        Args:
+            path (str): path of the file to map.
+        """
+        self.name = path
+        self.__position = 0
+        with open(path, 'rb') as input_file:
+            # Empty files cannot be mapped.
+            if input_file.seek(0, 2) == 0:
+                self.__data = b""
+            else:
+                self.__data = mmap.mmap(input_file.fileno(), 0,
+                                        access=mmap.ACCESS_READ)
+
+    def __enter__(self) -> "MappedFile":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Unmaps the file."""
+        if isinstance(self.__data, mmap.mmap):
+            self.__data.close()
+
+    def __iter__(self) -> typing.Iterator[str]:
+        """Yields the lines from the current position to the end of the file,
+        without their line breaks.
+        """
+        data = self.__data
+        find = data.find
+        end = len(data)
+        start = self.__position
+        while start < end:
+            newline = find(b"\n", start)
+            if newline == -1:
+                newline = end
+            self.__position = newline + 1
+            yield data[start:newline].decode()
+            start = newline + 1
+
+    def read(self) -> str:
+        """
+        Returns:
+            str: the rest of the file, decoded.
+        """
+        start = self.__position
+        self.__position = len(self.__data)
+        return self.__data[start:].decode()
+
+    def seekable(self) -> bool:
+        """
+        Returns:
+            bool: always True, every line can be read again.
+        """
+        return True
+
+    def seek(self, offset: int) -> int:
+        """Moves to the given byte offset.
+
+        Args:
+            offset (int): the offset to read from next.
+
+        Returns:
+            int: the new position.
+        """
+        self.__position = offset
+        return offset
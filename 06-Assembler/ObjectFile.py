@@ -0,0 +1,121 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import json
+import typing
+from Code import Code
+from Parser import Instruction
+from SymbolTable import PREDEFINED_SYMBOLS
+
+
+class ObjectFile:
+    """A relocatable object file: a single assembly module, encoded on its own
+    so that it can be linked into many programs without being assembled again.
+
+    - code: the encoded words of the module, as if it was loaded at ROM 0.
+    - labels: the ROM address of every label of the module, relative to its
+      start. All labels are global, as in the Hack assembly language.
+    - relocations: the indices of the words that refer to a label of the
+      module, and so must be moved by the address the module is loaded at.
+    - externals: (index, symbol) pairs of the words that refer to a symbol
+      the module does not define. The linker resolves each one to a label of
+      another module, or else allocates it as a variable. These words are 0
+      until then.
+
+    Numbers and predefined symbols are encoded right away.
+
+    The file itself is a JSON object with these four keys.
+    """
+
+    EXTENSION = ".obj"
+    VERSION = 1
+
+    def __init__(self, code: typing.List[int], labels: typing.Dict[str, int],
+                 relocations: typing.List[int],
+                 externals: typing.List[typing.Tuple[int, str]]) -> None:
+        """Creates an object file from its parts, see the class docstring."""
+        self.code = code
+        self.labels = labels
+        self.relocations = relocations
+        self.externals = externals
+
+    @staticmethod
+    def from_instructions(instructions: typing.Iterable[Instruction]
+                          ) -> "ObjectFile":
+        """Encodes a module.
+
+        Args:
+            instructions (typing.Iterable[Instruction]): the parsed module.
+
+        Returns:
+            ObjectFile: the encoded module.
+        """
+        code = []
+        labels = {}
+        references = []
+        for instruction in instructions:
+            command_type = instruction.command_type
+            if command_type == "C_COMMAND":
+                code.append(int(Code.c_instruction(
+                    instruction.dest, instruction.comp, instruction.jump), 2))
+            elif command_type == "A_COMMAND":
+                symbol = instruction.symbol
+                if symbol in PREDEFINED_SYMBOLS:
+                    code.append(PREDEFINED_SYMBOLS[symbol])
+                elif symbol.isnumeric():
+                    code.append(int(Code.a_instruction(int(symbol)), 2))
+                else:
+                    references.append((len(code), symbol))
+                    code.append(0)
+            else:
+                if instruction.symbol in labels:
+                    raise ValueError("Duplicate label: " + instruction.symbol)
+                labels[instruction.symbol] = len(code)
+
+        relocations = []
+        externals = []
+        for index, symbol in references:
+            if symbol in labels:
+                code[index] = labels[symbol]
+                relocations.append(index)
+            else:
+                externals.append((index, symbol))
+        return ObjectFile(code, labels, relocations, externals)
+
+    def write(self, output_file: typing.TextIO) -> None:
+        """Writes the object file.
+
+        Args:
+            output_file (typing.TextIO): writes the object to this file.
+        """
+        json.dump({
+            "version": ObjectFile.VERSION,
+            "code": self.code,
+            "labels": self.labels,
+            "relocations": self.relocations,
+            "externals": [[index, symbol] for index, symbol in self.externals],
+        }, output_file, separators=(",", ":"))
+        output_file.write("\n")
+
+    @staticmethod
+    def read(input_file: typing.TextIO) -> "ObjectFile":
+        """Reads an object file written by ObjectFile.write.
+
+        Args:
+            input_file (typing.TextIO): the object file.
+
+        Returns:
+            ObjectFile: the object.
+        """
+        contents = json.load(input_file)
+        if contents.get("version") != ObjectFile.VERSION:
+            raise ValueError("Unsupported object file version: "
+                             + repr(contents.get("version")))
+        return ObjectFile(contents["code"], contents["labels"],
+                          contents["relocations"],
+                          [(index, symbol)
+                           for index, symbol in contents["externals"]])
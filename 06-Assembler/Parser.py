@@ -8,24 +8,121 @@ Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 import typing
 
 
+class Instruction(typing.NamedTuple):
+    """A single pre-classified and pre-split assembly command.
+
+    Attributes:
+        command_type (str): "A_COMMAND", "C_COMMAND" or "L_COMMAND".
+        symbol (str): the Xxx of @Xxx or (Xxx), None for C-commands.
+        dest (str): the dest mnemonic of a C-command, None otherwise.
+        comp (str): the comp mnemonic of a C-command, None otherwise.
+        jump (str): the jump mnemonic of a C-command, None otherwise.
+        line_number (int): the 1-based source line of the command, if known.
+    """
+    command_type: str
+    symbol: typing.Optional[str] = None
+    dest: typing.Optional[str] = None
+    comp: typing.Optional[str] = None
+    jump: typing.Optional[str] = None
+    line_number: typing.Optional[int] = None
+
+    def text(self) -> str:
+        """
+        Returns:
+            str: the command in canonical assembly syntax.
+        """
+        if self.command_type == "A_COMMAND":
+            return "@" + self.symbol
+        if self.command_type == "L_COMMAND":
+            return "(" + self.symbol + ")"
+        text = self.comp
+        if self.dest != "null":
+            text = self.dest + "=" + text
+        if self.jump != "null":
+            text = text + ";" + self.jump
+        return text
+
+
 class Parser:
     """Encapsulates access to the input code. Reads an assembly program
     by reading each command line-by-line, parses the current command,
     and provides convenient access to the commands components (fields
     and symbols). In addition, removes all white space and comments.
+
+    The input is consumed lazily, one line at a time, so memory use does not
+    depend on the size of the input. Iterating over the parser yields an
+    Instruction record for every remaining command, and every line is
+    classified and split exactly once.
     """
 
-    def __init__(self, input_file: typing.TextIO) -> None:
+    def __init__(self, input_file: typing.Iterable[str]) -> None:
         """Opens the input file and gets ready to parse it.
 
         Args:
-            input_file (typing.TextIO): input file.
+            input_file (typing.Iterable[str]): input file, or any other
+                iterable of source lines.
         """
-        self.__input_lines = input_file.read().splitlines()
-        self.__counter = 0
-        self.__end = len(self.__input_lines)
-        cur_line = self.__input_lines[0]
-        self.__cur_line = cur_line.strip()
+        self.__instructions = self.parse_lines(input_file)
+        self.__cur_instruction = next(self.__instructions, None)
+
+    def __iter__(self) -> typing.Iterator[Instruction]:
+        """Yields the current command and every command after it."""
+        while self.__cur_instruction is not None:
+            yield self.__cur_instruction
+            self.advance()
+
+    @staticmethod
+    def parse_lines(lines: typing.Iterable[str]) -> typing.Iterator[Instruction]:
+        """Yields an Instruction for every command in the given lines,
+        skipping white space and comments.
+
+        Args:
+            lines (typing.Iterable[str]): assembly source lines.
+        """
+        parse_line = Parser.parse_line
+        for line_number, line in enumerate(lines, 1):
+            instruction = parse_line(line, line_number)
+            if instruction is not None:
+                yield instruction
+
+    @staticmethod
+    def parse_line(line: str, line_number: typing.Optional[int] = None
+                   ) -> typing.Optional[Instruction]:
+        """Classifies and splits a single line of assembly.
+
+        Args:
+            line (str): a line of assembly source.
+            line_number (int): the 1-based number of the line, if known.
+
+        Returns:
+            Instruction: the command on the line, or None if the line holds
+            only white space and comments.
+        """
+        ind_comment = line.find("//")
+        if ind_comment != -1:
+            line = line[:ind_comment]
+        line = line.strip()
+        if not line:
+            return None
+        if " " in line or "\t" in line:
+            line = "".join(line.split())
+        first = line[0]
+        if first == "@":
+            return Instruction("A_COMMAND", line[1:], line_number=line_number)
+        if first == "(":
+            return Instruction("L_COMMAND", line[1:line.find(")")],
+                               line_number=line_number)
+        ind_eq = line.find("=")
+        if ind_eq != -1:
+            dest = line[:ind_eq]
+            line = line[ind_eq + 1:]
+        else:
+            dest = "null"
+        ind_ot = line.find(";")
+        if ind_ot != -1:
+            return Instruction("C_COMMAND", None, dest, line[:ind_ot],
+                               line[ind_ot + 1:], line_number)
+        return Instruction("C_COMMAND", None, dest, line, "null", line_number)
 
     def has_more_commands(self) -> bool:
         """Checks if there are more commands in the input.
@@ -33,7 +130,7 @@ class Parser:
         Returns:
             bool: True if there are more commands, False otherwise.
         """
-        return self.__counter < self.__end
+        return self.__cur_instruction is not None
 
     def advance(self) -> None:
         """Advances to the next command in the input.
@@ -41,9 +138,14 @@ class Parser:
         Reads the next command from the input and makes it the current command.
         Should be called only if has_more_commands() is True.
         """
-        self.__counter += 1
-        if self.has_more_commands():
-            self.__cur_line = self.__input_lines[self.__counter].strip()
+        self.__cur_instruction = next(self.__instructions, None)
+
+    def instruction(self) -> Instruction:
+        """
+        Returns:
+            Instruction: the current command, already classified and split.
+        """
+        return self.__cur_instruction
 
     def command_type(self) -> str:
         """
@@ -53,14 +155,7 @@ class Parser:
             "C_COMMAND" for dest=comp;jump
             "L_COMMAND" (actually, pseudo-command) for (Xxx) where Xxx is a symbol
         """
-        if self.__cur_line == "" or self.__cur_line[0] == "/":
-            return None
-        elif self.__cur_line[0] == "@":
-            return "A_COMMAND"
-        elif self.__cur_line[0] == "(":
-            return "L_COMMAND"
-        else:
-            return "C_COMMAND"
+        return self.__cur_instruction.command_type
 
     def symbol(self) -> str:
         """
@@ -69,12 +164,7 @@ class Parser:
             (Xxx). Should be called only when command_type() is "A_COMMAND" or
             "L_COMMAND".
         """
-        com = self.command_type()
-        if com == "A_COMMAND":
-            return self.__cur_line[1:]
-        if com == "L_COMMAND":
-            last_ids = self.__cur_line.find(")")
-            return self.__cur_line[1:last_ids]
+        return self.__cur_instruction.symbol
 
     def dest(self) -> str:
         """
@@ -82,13 +172,7 @@ class Parser:
             str: the dest mnemonic in the current C-command. Should be called
             only when commandType() is "C_COMMAND".
         """
-        cur_line = self.__cur_line
-        ind_eq = cur_line.find("=")
-        if ind_eq != -1:
-            cur_line = cur_line[:ind_eq].rstrip()
-            return cur_line
-        else:
-            return "null"
+        return self.__cur_instruction.dest
 
     def comp(self) -> str:
         """
@@ -96,12 +180,7 @@ class Parser:
             str: the comp mnemonic in the current C-command. Should be called
             only when commandType() is "C_COMMAND".
         """
-        cur_line = self.__cur_line
-        ind_eq = cur_line.find("=")
-        if ind_eq != -1:
-            cur_line = cur_line[ind_eq + 1:].strip()
-        cur_line = cur_line.split(" ")[0].split(";")[0]
-        return cur_line
+        return self.__cur_instruction.comp
 
     def jump(self) -> str:
         """
@@ -109,9 +188,4 @@ class Parser:
             str: the jump mnemonic in the current C-command. Should be called
             only when commandType() is "C_COMMAND".
         """
-        cur_line = self.__cur_line.split()[0]
-        ind_ot = cur_line.find(";")
-        if ind_ot != -1:
-            return cur_line[ind_ot + 1:]
-        else:
-            return "null"
+        return self.__cur_instruction.jump
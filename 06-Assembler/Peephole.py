@@ -0,0 +1,237 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from Parser import Instruction
+
+# Jump mnemonics that always jump when their comp is the constant 0.
+ZERO_JUMPS = frozenset(("JEQ", "JGE", "JLE", "JMP"))
+
+
+class Peephole:
+    """A peephole optimizer for Hack assembly, run on the parsed instructions
+    before they are encoded. It applies the following patterns until none of
+    them changes the program any more:
+
+    - folded jumps: a jump to a label whose code is just an unconditional
+      jump to another label jumps straight to the final label.
+    - unreferenced labels: labels that no A-instruction refers to are
+      removed, which also opens up the patterns below.
+    - redundant reloads: an @Xxx is removed when A already holds Xxx, that is,
+      when the previous @Xxx was not followed by a label or by a C-instruction
+      that writes A.
+    - dead D stores: a C-instruction that only writes D is removed when D is
+      overwritten before anything reads it, within the same basic block.
+
+    Removing instructions moves the code that follows, so the pass assumes that
+    every jump target is a label. A program that jumps to a numeric address is
+    left untouched.
+    """
+
+    PATTERNS = ("folded jumps", "unreferenced labels", "redundant reloads",
+                "dead D stores")
+
+    def __init__(self) -> None:
+        """Creates an optimizer with all of its counters at zero."""
+        self.counts = dict.fromkeys(Peephole.PATTERNS, 0)
+
+    def optimize(self, instructions: typing.Iterable[Instruction]
+                 ) -> typing.List[Instruction]:
+        """Optimizes a program.
+
+        Args:
+            instructions (typing.Iterable[Instruction]): the parsed program.
+
+        Returns:
+            typing.List[Instruction]: the optimized program.
+        """
+        instructions = list(instructions)
+        if Peephole.jumps_to_numeric_address(instructions):
+            return instructions
+        while True:
+            length = len(instructions)
+            instructions = self.fold_jumps(instructions)
+            instructions = self.remove_unreferenced_labels(instructions)
+            instructions = self.remove_redundant_reloads(instructions)
+            instructions = self.remove_dead_d_stores(instructions)
+            if len(instructions) == length:
+                return instructions
+
+    def report(self) -> str:
+        """
+        Returns:
+            str: how many times each pattern was applied, one per line.
+        """
+        return "\n".join("%s: %d" % (pattern, count)
+                         for pattern, count in self.counts.items())
+
+    @staticmethod
+    def is_jump(instruction: Instruction) -> bool:
+        """
+        Returns:
+            bool: True if the instruction is a C-instruction that may jump.
+        """
+        return instruction.command_type == "C_COMMAND" \
+            and instruction.jump != "null"
+
+    @staticmethod
+    def is_unconditional_jump(instruction: Instruction) -> bool:
+        """
+        Returns:
+            bool: True if the instruction always jumps and has no other effect.
+        """
+        return instruction.command_type == "C_COMMAND" \
+            and instruction.dest == "null" \
+            and (instruction.jump == "JMP"
+                 or (instruction.comp == "0"
+                     and instruction.jump in ZERO_JUMPS))
+
+    @staticmethod
+    def jumps_to_numeric_address(instructions: typing.List[Instruction]
+                                 ) -> bool:
+        """
+        Returns:
+            bool: True if some jump's target is a number rather than a label.
+        """
+        for index in range(len(instructions) - 1):
+            instruction = instructions[index]
+            if instruction.command_type == "A_COMMAND" \
+                    and instruction.symbol.isnumeric() \
+                    and Peephole.is_jump(instructions[index + 1]):
+                return True
+        return False
+
+    def fold_jumps(self, instructions: typing.List[Instruction]
+                   ) -> typing.List[Instruction]:
+        """Retargets jumps to labels whose code is an unconditional jump."""
+        labels = {instruction.symbol for instruction in instructions
+                  if instruction.command_type == "L_COMMAND"}
+        # Every label that is followed by "@Target, unconditional jump".
+        targets = {}
+        pending = []
+        for index, instruction in enumerate(instructions):
+            if instruction.command_type == "L_COMMAND":
+                pending.append(instruction.symbol)
+                continue
+            if pending and instruction.command_type == "A_COMMAND" \
+                    and instruction.symbol in labels \
+                    and index + 1 < len(instructions) \
+                    and Peephole.is_unconditional_jump(
+                        instructions[index + 1]):
+                for label in pending:
+                    targets[label] = instruction.symbol
+            pending = []
+        if not targets:
+            return instructions
+
+        folded = list(instructions)
+        for index in range(len(folded) - 1):
+            instruction = folded[index]
+            if instruction.command_type != "A_COMMAND" \
+                    or instruction.symbol not in targets:
+                continue
+            jump = folded[index + 1]
+            # A must only serve as the jump target: the jump may not use it
+            # in any other way, and it may not be used after falling through.
+            if not Peephole.is_jump(jump) or jump.dest != "null" \
+                    or "A" in jump.comp or "M" in jump.comp:
+                continue
+            if not Peephole.is_unconditional_jump(jump) and (
+                    index + 2 >= len(folded)
+                    or folded[index + 2].command_type != "A_COMMAND"):
+                continue
+            target = Peephole.final_target(instruction.symbol, targets)
+            if target != instruction.symbol:
+                folded[index] = instruction._replace(symbol=target)
+                self.counts["folded jumps"] += 1
+        return folded
+
+    @staticmethod
+    def final_target(label: str, targets: typing.Dict[str, str]) -> str:
+        """Follows a chain of jumps to jumps, stopping at a cycle.
+
+        Args:
+            label (str): the label that is jumped to.
+            targets (typing.Dict[str, str]): the label each jump-only label
+                jumps to.
+
+        Returns:
+            str: the label the chain finally reaches.
+        """
+        seen = {label}
+        while label in targets and targets[label] not in seen:
+            label = targets[label]
+            seen.add(label)
+        return label
+
+    def remove_unreferenced_labels(self, instructions: typing.List[Instruction]
+                                   ) -> typing.List[Instruction]:
+        """Removes labels that no A-instruction refers to."""
+        referenced = {instruction.symbol for instruction in instructions
+                      if instruction.command_type == "A_COMMAND"}
+        kept = [instruction for instruction in instructions
+                if instruction.command_type != "L_COMMAND"
+                or instruction.symbol in referenced]
+        self.counts["unreferenced labels"] += len(instructions) - len(kept)
+        return kept
+
+    def remove_redundant_reloads(self, instructions: typing.List[Instruction]
+                                 ) -> typing.List[Instruction]:
+        """Removes A-instructions that load the value A already holds."""
+        kept = []
+        loaded = None
+        for instruction in instructions:
+            command_type = instruction.command_type
+            if command_type == "A_COMMAND":
+                if instruction.symbol == loaded:
+                    self.counts["redundant reloads"] += 1
+                    continue
+                loaded = instruction.symbol
+            elif command_type == "L_COMMAND" or "A" in instruction.dest:
+                loaded = None
+            kept.append(instruction)
+        return kept
+
+    def remove_dead_d_stores(self, instructions: typing.List[Instruction]
+                             ) -> typing.List[Instruction]:
+        """Removes C-instructions that only write D, when D is overwritten
+        before it is read.
+        """
+        kept = []
+        for index, instruction in enumerate(instructions):
+            if instruction.command_type == "C_COMMAND" \
+                    and instruction.dest == "D" \
+                    and instruction.jump == "null" \
+                    and Peephole.d_overwritten(instructions, index + 1):
+                self.counts["dead D stores"] += 1
+                continue
+            kept.append(instruction)
+        return kept
+
+    @staticmethod
+    def d_overwritten(instructions: typing.List[Instruction],
+                      start: int) -> bool:
+        """
+        Args:
+            instructions (typing.List[Instruction]): the program.
+            start (int): where to start looking.
+
+        Returns:
+            bool: True if D is written before it is read, without leaving the
+            basic block that starts at the given index.
+        """
+        for index in range(start, len(instructions)):
+            instruction = instructions[index]
+            command_type = instruction.command_type
+            if command_type == "A_COMMAND":
+                continue
+            if command_type == "L_COMMAND" or "D" in instruction.comp \
+                    or instruction.jump != "null":
+                return False
+            if "D" in instruction.dest:
+                return True
+        return False
@@ -0,0 +1,109 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from Parser import Instruction
+
+# The Hack ROM holds 32K 16-bit words.
+ROM_SIZE = 1 << 15
+
+
+class RomOverflowError(ValueError):
+    """Raised when a program does not fit in the ROM. The message holds the
+    largest regions of the program, see RomReport.
+    """
+
+
+class RomReport:
+    """The code size of a program, broken down by label regions. A region
+    starts at a label and runs up to the next label, so it covers one function,
+    or the span after one of its return labels. Code before the first label
+    belongs to the "<start>" region.
+    """
+
+    def __init__(self, labels: typing.Iterable[typing.Tuple[str, int]],
+                 size: int) -> None:
+        """Builds the report.
+
+        Args:
+            labels (typing.Iterable[typing.Tuple[str, int]]): the (label, ROM
+                address) pairs of the program.
+            size (int): the number of instructions in the program.
+        """
+        self.size = size
+        starts = sorted(((address, label) for label, address in labels),
+                        key=lambda start: start[0])
+        if not starts or starts[0][0] > 0:
+            starts.insert(0, (0, "<start>"))
+        self.regions = []
+        for index, (address, label) in enumerate(starts):
+            end = starts[index + 1][0] if index + 1 < len(starts) else size
+            self.regions.append((label, address, end - address))
+        self.regions.sort(key=lambda region: -region[2])
+
+    @staticmethod
+    def from_instructions(instructions: typing.Iterable[Instruction]
+                          ) -> "RomReport":
+        """
+        Args:
+            instructions (typing.Iterable[Instruction]): a parsed program.
+
+        Returns:
+            RomReport: the report of the program.
+        """
+        labels = []
+        size = 0
+        for instruction in instructions:
+            if instruction.command_type == "L_COMMAND":
+                labels.append((instruction.symbol, size))
+            else:
+                size += 1
+        return RomReport(labels, size)
+
+    def format(self, limit: typing.Optional[int] = None) -> str:
+        """
+        Args:
+            limit (int): how many regions to list, all of them if not given.
+
+        Returns:
+            str: the total size followed by one line per region, largest
+            first.
+        """
+        lines = ["%d words of %d (%.1f%% of the ROM)"
+                 % (self.size, ROM_SIZE, 100.0 * self.size / ROM_SIZE)]
+        for label, address, size in self.regions[:limit]:
+            if size == 0:
+                lines.append("%7d  %s (ROM %d, empty)" % (size, label, address))
+            else:
+                lines.append("%7d  %s (ROM %d-%d)"
+                             % (size, label, address, address + size - 1))
+        if limit is not None and len(self.regions) > limit:
+            lines.append("    ... %d smaller regions"
+                         % (len(self.regions) - limit))
+        return "\n".join(lines)
+
+    @staticmethod
+    def check(labels: typing.Iterable[typing.Tuple[str, int]], size: int,
+              rom_limit: typing.Optional[int] = ROM_SIZE) -> None:
+        """Checks that a program fits in the ROM.
+
+        Args:
+            labels (typing.Iterable[typing.Tuple[str, int]]): the (label, ROM
+                address) pairs of the program.
+            size (int): the number of instructions in the program.
+            rom_limit (int): the largest allowed size, None for no limit.
+
+        Raises:
+            RomOverflowError: if the program is larger than rom_limit, with
+            the largest regions of the program in its message.
+        """
+        if rom_limit is None or size <= rom_limit:
+            return
+        raise RomOverflowError(
+            "Program is %d words, %d over the %d-word limit. Largest "
+            "regions:\n%s" % (size, size - rom_limit, rom_limit,
+                              RomReport(labels, size).format(20)))
@@ -0,0 +1,100 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import json
+import typing
+from Parser import Instruction
+from SymbolTable import SymbolTable
+
+
+class SymbolMap:
+    """The symbol map of an assembled program: the ROM address of every label,
+    the RAM address of every variable, and the ROM address of the instruction
+    on every source line. Profilers use it to attribute emulator cycle counts
+    back to functions such as "Foo.bar" or "Foo.bar$ret.17".
+
+    The map is written either as text, with one tab-separated entry per line,
+    or as JSON.
+    """
+
+    FORMATS = {"text": ".map", "json": ".map.json"}
+
+    def __init__(self, instructions: typing.Iterable[Instruction],
+                 symboltable: SymbolTable) -> None:
+        """Builds the map of an assembled program.
+
+        Args:
+            instructions (typing.Iterable[Instruction]): the program, exactly
+                as it was encoded.
+            symboltable (SymbolTable): the symbol table the program was
+                encoded with.
+        """
+        self.labels = {}
+        self.listing = []
+        address = 0
+        for instruction in instructions:
+            if instruction.command_type == "L_COMMAND":
+                self.labels[instruction.symbol] = address
+            else:
+                self.listing.append((instruction.line_number, address,
+                                     instruction.text()))
+                address += 1
+        self.variables = {symbol: address
+                          for symbol, address in symboltable.items()
+                          if symbol not in self.labels}
+
+    def write(self, output_file: typing.TextIO,
+              output_format: str = "text") -> None:
+        """Writes the map.
+
+        Args:
+            output_file (typing.TextIO): writes the map to this file.
+            output_format (str): "text" or "json".
+        """
+        if output_format == "text":
+            self.write_text(output_file)
+        elif output_format == "json":
+            self.write_json(output_file)
+        else:
+            raise ValueError("Unknown symbol map format: " + output_format)
+
+    @staticmethod
+    def by_address(symbols: typing.Dict[str, int]
+                   ) -> typing.List[typing.Tuple[str, int]]:
+        """
+        Returns:
+            typing.List[typing.Tuple[str, int]]: the (symbol, address) pairs,
+            ordered by address.
+        """
+        return sorted(symbols.items(), key=lambda item: (item[1], item[0]))
+
+    def write_text(self, output_file: typing.TextIO) -> None:
+        """Writes the map as text, in three sections."""
+        lines = ["// Labels: ROM address, label"]
+        lines.extend("%d\t%s" % (address, label)
+                     for label, address in SymbolMap.by_address(self.labels))
+        lines.append("// Variables: RAM address, variable")
+        lines.extend("%d\t%s" % (address, variable)
+                     for variable, address
+                     in SymbolMap.by_address(self.variables))
+        lines.append("// Listing: source line, ROM address, instruction")
+        lines.extend("%s\t%d\t%s" % (line_number, address, text)
+                     for line_number, address, text in self.listing)
+        output_file.write("\n".join(lines) + "\n")
+
+    def write_json(self, output_file: typing.TextIO) -> None:
+        """Writes the map as a JSON object, with the keys "labels" and
+        "variables" (symbol to address), and "listing" (a list of
+        [source line, ROM address] pairs).
+        """
+        json.dump({
+            "labels": dict(SymbolMap.by_address(self.labels)),
+            "variables": dict(SymbolMap.by_address(self.variables)),
+            "listing": [[line_number, address]
+                        for line_number, address, _ in self.listing],
+        }, output_file)
+        output_file.write("\n")
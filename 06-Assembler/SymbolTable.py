@@ -5,43 +5,58 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import sys
+import types
+import typing
+
+
+# The predefined symbols and their pre-allocated RAM addresses, according to
+# section 6.2.3 of the book. This read-only base layer is shared by every
+# symbol table.
+PREDEFINED_SYMBOLS = types.MappingProxyType({
+    "SP": 0,
+    "LCL": 1,
+    "ARG": 2,
+    "THIS": 3,
+    "THAT": 4,
+    "R0": 0,
+    "R1": 1,
+    "R2": 2,
+    "R3": 3,
+    "R4": 4,
+    "R5": 5,
+    "R6": 6,
+    "R7": 7,
+    "R8": 8,
+    "R9": 9,
+    "R10": 10,
+    "R11": 11,
+    "R12": 12,
+    "R13": 13,
+    "R14": 14,
+    "R15": 15,
+    "SCREEN": 16384,
+    "KBD": 24576
+})
 
 
 class SymbolTable:
     """
     A symbol table that keeps a correspondence between symbolic labels and
     numeric addresses.
+
+    The table is layered: lookups first consult a small per-file overlay that
+    holds the labels and variables of the file, then the shared predefined
+    symbols. Creating a table therefore costs nothing, however many files are
+    assembled in one process.
     """
+    __slots__ = ("__dict",)
 
     def __init__(self) -> None:
-        """Creates a new symbol table initialized with all the predefined symbols
-        and their pre-allocated RAM addresses, according to section 6.2.3 of the
-        book.
+        """Creates a new symbol table, which starts out holding only the
+        shared predefined symbols.
         """
-        self.__dict = {"SP": 0,
-                       "LCL": 1,
-                       "ARG": 2,
-                       "THIS": 3,
-                       "THAT": 4,
-                       "R0": 0,
-                       "R1": 1,
-                       "R2": 2,
-                       "R3": 3,
-                       "R4": 4,
-                       "R5": 5,
-                       "R6": 6,
-                       "R7": 7,
-                       "R8": 8,
-                       "R9": 9,
-                       "R10": 10,
-                       "R11": 11,
-                       "R12": 12,
-                       "R13": 13,
-                       "R14": 14,
-                       "R15": 15,
-                       "SCREEN": 16384,
-                       "KBD": 24576
-                       }
+        self.__dict = {}
 
     def add_entry(self, symbol: str, address: int) -> None:
         """Adds the pair (symbol, address) to the table.
@@ -50,7 +65,7 @@ class SymbolTable:
             symbol (str): the symbol to add.
             address (int): the address corresponding to the symbol.
         """
-        self.__dict[symbol] = address
+        self.__dict[sys.intern(symbol)] = address
 
     def contains(self, symbol: str) -> bool:
         """Does the symbol table contain the given symbol?
@@ -61,7 +76,7 @@ class SymbolTable:
         Returns:
             bool: True if the symbol is contained, False otherwise.
         """
-        return symbol in self.__dict
+        return symbol in self.__dict or symbol in PREDEFINED_SYMBOLS
 
     def get_address(self, symbol: str) -> int:
         """Returns the address associated with the symbol.
@@ -70,6 +85,20 @@ class SymbolTable:
             symbol (str): a symbol.
 
         Returns:
-            int: the address associated with the symbol.
+            int: the address associated with the symbol, or None if the table
+            does not contain it. Use this instead of contains() followed by
+            get_address() to look the symbol up only once.
+        """
+        address = self.__dict.get(symbol)
+        if address is None:
+            return PREDEFINED_SYMBOLS.get(symbol)
+        return address
+
+    def items(self) -> typing.Iterator[typing.Tuple[str, int]]:
+        """
+        Returns:
+            typing.Iterator[typing.Tuple[str, int]]: the (symbol, address) pairs
+            added with add_entry, that is, the labels and variables of the
+            file, without the predefined symbols.
         """
-        return self.__dict.get(symbol)
+        return iter(self.__dict.items())
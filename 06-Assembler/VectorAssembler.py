@@ -0,0 +1,241 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import itertools
+import typing
+from Code import Code
+from HackWriter import HackWriter
+from Parser import Parser
+from RomReport import ROM_SIZE, RomReport
+from SymbolTable import PREDEFINED_SYMBOLS
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional, only this backend needs it.
+    numpy = None
+
+# Lines read and cleaned at a time, see VectorAssembler.read_code.
+BATCH_LINES = 1 << 16
+
+
+class VectorAssembler:
+    """An alternative assembler backend for very large inputs, which works on
+    whole-program arrays instead of looping over the lines in Python.
+
+    The input is read in batches of lines, and only the code of every line,
+    without comments and white space, is kept, in a fixed-width bytes array
+    as wide as the longest instruction or label. That array takes about as
+    much memory as the code itself, and comments cost nothing. All lines are
+    then classified at once into A-instructions, C-instructions and
+    labels. Label addresses come from a cumulative count of the instructions,
+    symbols and C-instructions are encoded once per distinct text and then
+    spread over the program with a vectorized lookup, and the result is a
+    uint16 word array that is written out in one bulk operation.
+
+    The output is identical to that of the line-by-line assembler. NumPy is
+    required.
+    """
+
+    @staticmethod
+    def assemble(input_file: typing.TextIO,
+                 rom_limit: typing.Optional[int] = ROM_SIZE
+                 ) -> "numpy.ndarray":
+        """Assembles a whole file.
+
+        Args:
+            input_file (typing.TextIO): the file to assemble.
+            rom_limit (int): the largest allowed program, None for no limit.
+
+        Returns:
+            numpy.ndarray: the encoded words, as a uint16 array.
+        """
+        if numpy is None:
+            raise ImportError("The vectorized assembler requires NumPy")
+        lines = VectorAssembler.read_code(input_file)
+        if lines.size == 0:
+            return numpy.zeros(0, dtype=numpy.uint16)
+
+        first = VectorAssembler.first_chars(lines)
+        is_label = first == b"("
+        is_a = first == b"@"
+        is_instruction = ~is_label
+
+        # The ROM address of a label is the number of instructions before it.
+        rom_addresses = numpy.cumsum(is_instruction) - is_instruction
+        label_names = VectorAssembler.before(
+            VectorAssembler.drop_first_char(lines[is_label]), b")")
+        labels = dict(zip(numpy.char.decode(label_names).tolist(),
+                          rom_addresses[is_label].tolist()))
+
+        size = int(is_instruction.sum())
+        RomReport.check(labels.items(), size, rom_limit)
+        words = numpy.empty(size, dtype=numpy.uint16)
+        positions = rom_addresses[is_a]
+        words[positions] = VectorAssembler.encode_a_instructions(
+            VectorAssembler.drop_first_char(lines[is_a]), labels)
+        is_c = is_instruction & ~is_a
+        c_texts, c_inverse = numpy.unique(lines[is_c], return_inverse=True)
+        c_words = numpy.array(
+            [VectorAssembler.encode_c_instruction(text.decode())
+             for text in c_texts.tolist()], dtype=numpy.uint16)
+        words[rom_addresses[is_c]] = c_words[c_inverse.ravel()]
+        return words
+
+    @staticmethod
+    def read_code(input_file: typing.TextIO) -> "numpy.ndarray":
+        """Reads the code of a file, BATCH_LINES lines at a time.
+
+        Args:
+            input_file (typing.TextIO): the file to read.
+
+        Returns:
+            numpy.ndarray: the non-empty lines, without comments and white
+            space, as a bytes array.
+        """
+        batches = []
+        while True:
+            batch = list(itertools.islice(input_file, BATCH_LINES))
+            if not batch:
+                break
+            # Comments are cut here, so that they never widen the array.
+            lines = numpy.array([line.partition("//")[0] for line in batch],
+                                dtype=str)
+            lines = numpy.char.strip(lines)
+            lines = numpy.char.replace(numpy.char.replace(lines, " ", ""),
+                                       "\t", "")
+            batches.append(numpy.char.encode(
+                lines[numpy.char.str_len(lines) > 0], "utf-8"))
+        if not batches:
+            return numpy.zeros(0, dtype="S1")
+        return numpy.concatenate(batches)
+
+    @staticmethod
+    def encode_a_instructions(symbols: "numpy.ndarray",
+                              labels: typing.Dict[str, int]
+                              ) -> "numpy.ndarray":
+        """Encodes the A-instructions of a program.
+
+        Args:
+            symbols (numpy.ndarray): the Xxx of every @Xxx, in program order,
+                as bytes.
+            labels (typing.Dict[str, int]): the ROM address of every label.
+
+        Returns:
+            numpy.ndarray: the encoded words, as a uint16 array.
+        """
+        if symbols.size == 0:
+            return numpy.zeros(0, dtype=numpy.uint16)
+        unique, first_seen, inverse = numpy.unique(
+            symbols, return_index=True, return_inverse=True)
+        unique_values = numpy.zeros(unique.size, dtype=numpy.int64)
+        # Symbols that are neither labels, predefined symbols nor numbers are
+        # variables, allocated from RAM[16] in order of first reference.
+        variables = []
+        for index, symbol in enumerate(numpy.char.decode(unique).tolist()):
+            address = labels.get(symbol)
+            if address is None:
+                address = PREDEFINED_SYMBOLS.get(symbol)
+            if address is not None:
+                unique_values[index] = address
+            elif symbol.isnumeric():
+                unique_values[index] = int(symbol)
+            else:
+                variables.append(index)
+        if variables:
+            variables = numpy.array(variables)
+            variables = variables[numpy.argsort(first_seen[variables])]
+            unique_values[variables] = numpy.arange(16, 16 + variables.size)
+        values = unique_values[inverse.ravel()]
+        # Like the line-by-line assembler, out-of-range values saturate.
+        return numpy.clip(values, 0, 0xFFFF).astype(numpy.uint16)
+
+    @staticmethod
+    def encode_c_instruction(text: str) -> int:
+        """
+        Args:
+            text (str): a C-instruction without white space or comments.
+
+        Returns:
+            int: the encoded instruction.
+        """
+        instruction = Parser.parse_line(text)
+        return int(Code.c_instruction(instruction.dest, instruction.comp,
+                                      instruction.jump), 2)
+
+    @staticmethod
+    def before(lines: "numpy.ndarray", separator: bytes) -> "numpy.ndarray":
+        """
+        Args:
+            lines (numpy.ndarray): a bytes array of strings.
+            separator (bytes): the separator to look for.
+
+        Returns:
+            numpy.ndarray: the part of every string before the first
+            occurrence of the separator, or the whole string if it has none.
+        """
+        if lines.size == 0:
+            return lines
+        return numpy.char.partition(lines, separator)[:, 0]
+
+    @staticmethod
+    def first_chars(lines: "numpy.ndarray") -> "numpy.ndarray":
+        """
+        Args:
+            lines (numpy.ndarray): a non-empty bytes array of non-empty
+                strings.
+
+        Returns:
+            numpy.ndarray: the first byte of every string.
+        """
+        width = lines.dtype.itemsize
+        return lines.view("S1").reshape(lines.size, width)[:, 0]
+
+    @staticmethod
+    def drop_first_char(lines: "numpy.ndarray") -> "numpy.ndarray":
+        """
+        Args:
+            lines (numpy.ndarray): a bytes array of non-empty strings.
+
+        Returns:
+            numpy.ndarray: every string without its first byte.
+        """
+        width = lines.dtype.itemsize
+        if lines.size == 0 or width <= 1:
+            return numpy.full(lines.size, b"", dtype="S1")
+        chars = lines.view("S1").reshape(lines.size, width)[:, 1:]
+        return numpy.ascontiguousarray(chars).view("S%d" % (width - 1)) \
+            .reshape(lines.size)
+
+    @staticmethod
+    def write(words: "numpy.ndarray", output_file: typing.IO,
+              output_format: str = "hack") -> None:
+        """Writes the words in the given format, with a single write call.
+
+        Args:
+            words (numpy.ndarray): the encoded words, as a uint16 array.
+            output_file (typing.IO): a text file for "hack", a binary file
+                for every other format.
+            output_format (str): one of the keys of HackWriter.FORMATS.
+        """
+        little_endian = words.astype("<u2")
+        if output_format == "hack":
+            # Unpack the big-endian bytes into '0'/'1' characters, and add a
+            # line break after every 16 of them.
+            bits = numpy.unpackbits(words.astype(">u2").view(numpy.uint8))
+            text = numpy.empty((words.size, 17), dtype=numpy.uint8)
+            text[:, :16] = bits.reshape(words.size, 16) + ord("0")
+            text[:, 16] = ord("\n")
+            output_file.write(text.tobytes().decode("ascii"))
+        elif output_format == "bin":
+            output_file.write(little_endian.tobytes())
+        elif output_format == "hex":
+            output_file.write(
+                HackWriter.intel_hex(little_endian.tobytes()).encode("ascii"))
+        elif output_format == "npy":
+            numpy.save(output_file, little_endian)
+        else:
+            raise ValueError("Unknown output format: " + output_format)
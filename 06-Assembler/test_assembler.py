@@ -0,0 +1,480 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import contextlib
+import glob
+import io
+import os
+import random
+import struct
+import tempfile
+import typing
+import unittest
+from unittest import mock
+import AssemblyCache
+import Main
+import VectorAssembler
+from Benchmark import REAL_PROGRAMS, generate_program
+from Code import COMP_TABLE, DEST_TABLE, JUMP_TABLE
+from HackWriter import HackWriter
+from Linker import Linker
+from ObjectFile import ObjectFile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# The comp of every encoded C-instruction, as a Python expression of A, M
+# and D, keyed by its code.
+OPERATIONS = {
+    code: eval("lambda A, M, D: " + mnemonic.replace("!", "~")
+               .replace("<<", "<<1").replace(">>", ">>1"))
+    for mnemonic, code in COMP_TABLE.items()
+}
+DESTS = {code: mnemonic for mnemonic, code in DEST_TABLE.items()}
+# Whether each jump is taken, given the result of the comp.
+CONDITIONS = {
+    "null": lambda out: False,
+    "JGT": lambda out: out > 0,
+    "JEQ": lambda out: out == 0,
+    "JGE": lambda out: out >= 0,
+    "JLT": lambda out: out < 0,
+    "JNE": lambda out: out != 0,
+    "JLE": lambda out: out <= 0,
+    "JMP": lambda out: True,
+}
+JUMPS = {code: CONDITIONS[mnemonic] for mnemonic, code in JUMP_TABLE.items()}
+
+
+def to_signed(value: int) -> int:
+    """
+    Args:
+        value (int): any integer.
+
+    Returns:
+        int: the value truncated to 16 bits, as the Hack CPU would.
+    """
+    value &= 0xFFFF
+    return value - 0x10000 if value & 0x8000 else value
+
+
+def run(hack: str, ram: typing.Optional[typing.Dict[int, int]] = None,
+        max_cycles: int = 1000000) -> typing.Dict[int, int]:
+    """Runs a program on a Hack CPU with the shift extension, until it
+    reaches a loop such as "(END) @END 0;JMP", which jumps to itself.
+
+    Args:
+        hack (str): the program, in the .hack format.
+        ram (typing.Dict[int, int]): the initial RAM, every other word is 0.
+        max_cycles (int): the program fails if it runs any longer.
+
+    Returns:
+        typing.Dict[int, int]: the nonzero words of the RAM at the end.
+    """
+    program = []
+    for word in hack.split():
+        if word[0] == "0":
+            program.append((int(word, 2), None, None, None))
+            continue
+        code = word[3:10] if word.startswith("111") else word[:10]
+        program.append((None, OPERATIONS[code], DESTS[word[10:13]],
+                        JUMPS[word[13:]]))
+    ram = dict(ram or {})
+    a = d = pc = 0
+    for _ in range(max_cycles):
+        value, operation, dest, jump = program[pc]
+        if operation is None:
+            if value == pc and program[pc + 1][3] is not CONDITIONS["null"]:
+                return {address: word for address, word in ram.items()
+                        if word}
+            a = value
+            pc += 1
+            continue
+        out = to_signed(operation(a, ram.get(a, 0), d))
+        address = a
+        if "M" in dest:
+            ram[address] = out
+        if "D" in dest:
+            d = out
+        if "A" in dest:
+            a = out & 0x7FFF
+        if jump(out):
+            pc = address
+        else:
+            pc += 1
+    raise AssertionError("The program did not halt")
+
+
+def generate_terminating_program(seed: int, instructions: int = 400) -> str:
+    """Generates a program that always halts: every jump goes forward, to a
+    label, and some labels only jump on to a later one, which the peephole
+    optimizer folds. Labels and jumps are followed by a data address, so the
+    RAM never depends on where the code is placed.
+
+    Args:
+        seed (int): the seed of the generator.
+        instructions (int): roughly the number of instructions.
+
+    Returns:
+        str: the program.
+    """
+    generator = random.Random(seed)
+    comps = ("D=M", "D=A", "M=D", "M=M+1", "D=D+M", "D=D-A", "M=-1", "M=0",
+             "D=D+1", "MD=M-1", "D=!D", "M=D|M", "D=D&A", "D=D<<", "M=M>>")
+
+    def address() -> str:
+        return generator.choice(("@x", "@y", "@z", "@R3", "@SCREEN",
+                                 "@%d" % generator.randrange(16)))
+
+    lines = []
+    label = 0
+    for _ in range(instructions):
+        draw = generator.random()
+        if draw < 0.05:
+            lines.append("(L%d)" % label)
+            label += 1
+            if generator.random() < 0.3:
+                lines += ["@L%d" % label, "0;JMP"]
+            lines.append(address())
+        elif draw < 0.12:
+            lines += ["@L%d" % generator.randint(label, label + 3),
+                      "D;" + generator.choice(("JGT", "JEQ", "JLT", "JNE",
+                                               "JGE", "JLE", "JMP")),
+                      address()]
+        elif draw < 0.45:
+            lines.append(address())
+        else:
+            lines.append(generator.choice(comps))
+    for index in range(label, label + 4):
+        lines.append("(L%d)" % index)
+    lines += [address(), "(END)", "@END", "0;JMP"]
+    return "\n".join(lines) + "\n"
+
+
+def read_programs() -> typing.List[typing.Tuple[str, str]]:
+    """
+    Returns:
+        typing.List[typing.Tuple[str, str]]: the name and source of the real
+        programs and of a few synthetic ones.
+    """
+    programs = []
+    for path in sorted(glob.glob(os.path.join(HERE, REAL_PROGRAMS))):
+        with open(path, 'r') as input_file:
+            programs.append((os.path.basename(path), input_file.read()))
+    for seed in range(3):
+        programs.append(("synthetic-%d" % seed,
+                         "\n".join(generate_program(3000, seed=seed)) + "\n"))
+    return programs
+
+
+def assemble_text(source: str, **options) -> str:
+    """
+    Args:
+        source (str): a program.
+        **options: keyword arguments of Main.assemble_file.
+
+    Returns:
+        str: the program in the .hack format. The input is seekable, so it is
+        assembled in two passes unless the options say otherwise.
+    """
+    output_file = io.StringIO()
+    with contextlib.redirect_stderr(io.StringIO()):
+        Main.assemble_file(io.StringIO(source), output_file, rom_limit=None,
+                           **options)
+    return output_file.getvalue()
+
+
+class BackendTest(unittest.TestCase):
+    """Every backend of the assembler gives the output of the two-pass one."""
+
+    def setUp(self) -> None:
+        self.programs = read_programs()
+
+    def assert_same_output(self, assemble: typing.Callable[[str], str]
+                           ) -> None:
+        for name, source in self.programs:
+            with self.subTest(program=name):
+                self.assertEqual(assemble(source), assemble_text(source))
+
+    def test_single_pass(self) -> None:
+        self.assert_same_output(
+            lambda source: assemble_text(source, single_pass=True))
+
+    @unittest.skipIf(VectorAssembler.numpy is None, "NumPy is not installed")
+    def test_vectorized(self) -> None:
+        self.assert_same_output(
+            lambda source: assemble_text(source, vectorized=True))
+
+    @unittest.skipIf(VectorAssembler.numpy is None, "NumPy is not installed")
+    def test_vectorized_batches(self) -> None:
+        # Long and non-ASCII comments, in batches of a few lines.
+        source = "".join(
+            "@v%d // \u00e9t\u00e9 %s\n D = M ; JGT\t// x\r\n(L%d)\n"
+            % (index, "=" * (index * 50), index) for index in range(20))
+        with mock.patch.object(VectorAssembler, "BATCH_LINES", 7):
+            self.assertEqual(assemble_text(source, vectorized=True),
+                             assemble_text(source))
+
+    def test_chunked(self) -> None:
+        # Small chunks on several workers, even on a single CPU.
+        with mock.patch.object(Main, "MIN_PARALLEL_INSTRUCTIONS", 0), \
+                mock.patch.object(Main, "MIN_CHUNK_LINES", 500), \
+                mock.patch.object(Main.os, "cpu_count", return_value=2):
+            self.assert_same_output(
+                lambda source: assemble_text(source, jobs=2))
+
+    def test_chunked_serial(self) -> None:
+        self.assert_same_output(lambda source: assemble_text(source, jobs=2))
+
+    def test_mapped_file(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            def assemble_mapped(source: str) -> str:
+                path = os.path.join(temp_dir, "Prog.asm")
+                with open(path, 'w') as input_file:
+                    input_file.write(source)
+                output_file = io.StringIO()
+                Main.assemble_file(path, output_file, rom_limit=None)
+                return output_file.getvalue()
+
+            self.assert_same_output(assemble_mapped)
+
+    def test_in_memory(self) -> None:
+        self.assert_same_output(
+            lambda source: "".join(
+                format(word, "016b") + "\n"
+                for word in Main.assemble(source, rom_limit=None)[0]))
+
+
+class PeepholeTest(unittest.TestCase):
+    """Optimized programs leave the RAM as the unoptimized ones do."""
+
+    def assert_same_behavior(self, source: str,
+                             ram: typing.Optional[typing.Dict[int, int]] = None
+                             ) -> None:
+        plain = assemble_text(source)
+        optimized = assemble_text(source, optimize=True)
+        self.assertLessEqual(len(optimized), len(plain))
+        self.assertEqual(run(optimized, ram), run(plain, ram))
+
+    def test_mult(self) -> None:
+        with open(os.path.join(HERE, os.pardir, "04-Machine Language",
+                               "mult", "Mult.asm"), 'r') as input_file:
+            source = input_file.read()
+        for ram in ({0: 7, 1: 9}, {0: 0, 1: 5}, {0: 123, 1: 45}):
+            with self.subTest(ram=ram):
+                self.assert_same_behavior(source, ram)
+
+    def test_generated(self) -> None:
+        for seed in range(20):
+            with self.subTest(seed=seed):
+                self.assert_same_behavior(generate_terminating_program(seed))
+
+    def test_removes_redundant_code(self) -> None:
+        source = "@x\nD=M\n@x\nD=M\nM=D\n(END)\n@END\n0;JMP\n"
+        self.assertLess(len(assemble_text(source, optimize=True)),
+                        len(assemble_text(source)))
+
+
+class LinkerTest(unittest.TestCase):
+    """Linked modules give the program of their concatenated sources."""
+
+    @staticmethod
+    def link(modules: typing.List[str]) -> str:
+        """
+        Args:
+            modules (typing.List[str]): the sources of the modules.
+
+        Returns:
+            str: the linked program, in the .hack format.
+        """
+        objects = []
+        for source in modules:
+            object_file = io.StringIO()
+            Main.assemble_file(io.StringIO(source), object_file,
+                               object_file=True)
+            object_file.seek(0)
+            objects.append(ObjectFile.read(object_file))
+        return "".join(word + "\n"
+                       for word in Linker(objects).link(rom_limit=None))
+
+    def test_split_programs(self) -> None:
+        # Labels and variables are referenced across the modules, both
+        # before and after the module that defines them.
+        for name, source in read_programs():
+            lines = source.splitlines(keepends=True)
+            for parts in (1, 2, 5):
+                with self.subTest(program=name, parts=parts):
+                    size = -(-len(lines) // parts)
+                    modules = ["".join(lines[start:start + size])
+                               for start in range(0, len(lines), size)]
+                    self.assertEqual(self.link(modules), assemble_text(source))
+
+    def test_duplicate_label(self) -> None:
+        with self.assertRaisesRegex(ValueError, "Duplicate label: LOOP"):
+            self.link(["(LOOP)\n@LOOP\n0;JMP\n"] * 2)
+
+
+def parse_intel_hex(text: str) -> bytes:
+    """Loads an Intel HEX file, checking the checksum and length of every
+    record, and that the file ends with an end of file record.
+
+    Args:
+        text (str): the records.
+
+    Returns:
+        bytes: the memory image, from address 0.
+    """
+    image = {}
+    upper = 0
+    records = text.splitlines()
+    for line in records:
+        assert line.startswith(":"), line
+        record = bytes.fromhex(line[1:])
+        assert len(record) == record[0] + 5, line
+        assert sum(record) & 0xFF == 0, "Bad checksum: " + line
+        address = (record[1] << 8) | record[2]
+        record_type, data = record[3], record[4:-1]
+        if record_type == 0:
+            for index, byte in enumerate(data):
+                image[(upper << 16) + address + index] = byte
+        elif record_type == 4:
+            upper = (data[0] << 8) | data[1]
+        else:
+            assert record_type == 1 and line == records[-1], line
+    assert records[-1] == ":00000001FF"
+    return bytes(image[address] for address in range(len(image)))
+
+
+class HackWriterTest(unittest.TestCase):
+    """Every output format holds the words of the program."""
+
+    def setUp(self) -> None:
+        generator = random.Random(0)
+        # More than 64K bytes, so the Intel HEX file needs an extended
+        # address record.
+        self.values = [generator.randrange(1 << 16) for _ in range(40000)]
+        self.words = [format(value, "016b") for value in self.values]
+
+    def write(self, output_format: str) -> bytes:
+        output_file = io.BytesIO()
+        HackWriter.write(self.words, output_file, output_format)
+        return output_file.getvalue()
+
+    def test_bin(self) -> None:
+        data = self.write("bin")
+        self.assertEqual(list(struct.unpack("<%dH" % len(self.values), data)),
+                         self.values)
+
+    def test_hex(self) -> None:
+        text = self.write("hex").decode("ascii")
+        self.assertEqual(parse_intel_hex(text),
+                         struct.pack("<%dH" % len(self.values), *self.values))
+        self.assertIn(":020000040001F9\n", text)
+        self.assertEqual(parse_intel_hex(
+            HackWriter.intel_hex(b"")), b"")
+
+    def test_npy(self) -> None:
+        data = self.write("npy")
+        self.assertEqual(data[:8], b"\x93NUMPY\x01\x00")
+        header_length = int.from_bytes(data[8:10], "little")
+        self.assertEqual((10 + header_length) % 64, 0)
+        self.assertEqual(data[10 + header_length:], self.write("bin"))
+        if VectorAssembler.numpy is not None:
+            loaded = VectorAssembler.numpy.load(io.BytesIO(data))
+            self.assertEqual(loaded.dtype, VectorAssembler.numpy.uint16)
+            self.assertEqual(loaded.tolist(), self.values)
+
+    @unittest.skipIf(VectorAssembler.numpy is None, "NumPy is not installed")
+    def test_vectorized_formats(self) -> None:
+        # The NumPy backend writes the same files.
+        source = read_programs()[1][1]
+        for output_format in ("bin", "hex", "npy"):
+            with self.subTest(output_format=output_format):
+                outputs = []
+                for vectorized in (False, True):
+                    output_file = io.BytesIO()
+                    Main.assemble_file(io.StringIO(source), output_file,
+                                       output_format=output_format,
+                                       vectorized=vectorized)
+                    outputs.append(output_file.getvalue())
+                self.assertEqual(outputs[0], outputs[1])
+
+
+class AssemblyCacheTest(unittest.TestCase):
+    """Hits, restores and evictions of the AssemblyCache."""
+
+    def setUp(self) -> None:
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.temp_dir = temp_dir.name
+        self.cache = AssemblyCache.AssemblyCache(
+            os.path.join(self.temp_dir, "cache"))
+
+    def write(self, name: str, contents: str) -> str:
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'w') as output_file:
+            output_file.write(contents)
+        return path
+
+    def test_key(self) -> None:
+        source = b"@x\nD=M\n" * 100
+        key = self.cache.key(io.BytesIO(source), "hack")
+        with mock.patch.object(AssemblyCache, "HASH_CHUNK_BYTES", 7):
+            self.assertEqual(self.cache.key(io.BytesIO(source), "hack"), key)
+        self.assertNotEqual(self.cache.key(io.BytesIO(source), "bin"), key)
+        self.assertNotEqual(self.cache.key(io.BytesIO(source + b"M=D\n"),
+                                           "hack"), key)
+
+    def test_hit(self) -> None:
+        input_path = self.write("Prog.asm", "@5\nD=A\n")
+        with mock.patch.object(Main, "assemble_file",
+                               wraps=Main.assemble_file) as assemble_file:
+            output_path = Main.assemble_path(input_path, self.cache)
+            with open(output_path, 'r') as output_file:
+                expected = output_file.read()
+            os.remove(output_path)
+            calls = assemble_file.call_count
+            # The number of workers is not part of the key.
+            Main.assemble_path(input_path, self.cache, jobs=2)
+            self.assertEqual(assemble_file.call_count, calls)
+        with open(output_path, 'r') as output_file:
+            self.assertEqual(output_file.read(), expected)
+        # A changed source misses.
+        self.write("Prog.asm", "@6\nD=A\n")
+        Main.assemble_path(input_path, self.cache)
+        with open(output_path, 'r') as output_file:
+            self.assertNotEqual(output_file.read(), expected)
+
+    def test_restore(self) -> None:
+        output_path = self.write("Prog.hack", "0000000000000101\n")
+        self.cache.store("key", output_path)
+        # An output that already holds the entry is not written again.
+        os.utime(output_path, (1000, 1000))
+        self.assertTrue(self.cache.restore("key", output_path))
+        self.assertEqual(os.stat(output_path).st_mtime, 1000)
+        # A different one is replaced.
+        self.write("Prog.hack", "1110110000010000\n")
+        self.assertTrue(self.cache.restore("key", output_path))
+        with open(output_path, 'r') as output_file:
+            self.assertEqual(output_file.read(), "0000000000000101\n")
+        self.assertFalse(self.cache.restore("other", output_path))
+
+    def test_eviction(self) -> None:
+        self.cache.max_bytes = 250
+        output_path = self.write("Prog.hack", "0" * 100)
+        self.cache.store("first", output_path)
+        os.utime(self.cache.entry_path("first"), (1000, 1000))
+        self.cache.store("second", output_path)
+        os.utime(self.cache.entry_path("second"), (2000, 2000))
+        # A hit makes the first entry the most recently used one.
+        self.assertTrue(self.cache.restore("first", output_path))
+        self.cache.store("third", output_path)
+        self.assertTrue(os.path.exists(self.cache.entry_path("first")))
+        self.assertFalse(os.path.exists(self.cache.entry_path("second")))
+        self.assertTrue(os.path.exists(self.cache.entry_path("third")))
+
+
+if "__main__" == __name__:
+    unittest.main()
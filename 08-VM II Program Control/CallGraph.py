@@ -0,0 +1,89 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from Parser import CALL, FUNCTION, Command
+
+
+class CallGraph:
+    """The call graph of a whole VM program, built from its call commands.
+
+    The VM language has no function pointers, so the graph is exact: a
+    function that cannot be reached through calls from Sys.init is never run,
+    and need not be translated. Commands before the first function of a file
+    do not belong to any function, and the functions they call are roots of
+    the graph too.
+    """
+
+    def __init__(self, modules: typing.Iterable[
+            typing.Tuple[str, typing.List[Command]]]) -> None:
+        """Builds the call graph of a program.
+
+        Args:
+            modules (typing.Iterable[typing.Tuple[str, typing.List[Command]]]):
+                the (file name, commands) pairs of the program.
+        """
+        # The functions every function calls, and its number of commands.
+        self.calls = {}
+        self.sizes = {}
+        self.top_level_calls = []
+        for _, commands in modules:
+            function = None
+            for command in commands:
+                if command.opcode == FUNCTION:
+                    function = command.name
+                    if function in self.calls:
+                        raise ValueError("Duplicate function: " + function)
+                    self.calls[function] = []
+                    self.sizes[function] = 0
+                elif command.opcode == CALL:
+                    if function is None:
+                        self.top_level_calls.append(command.name)
+                    else:
+                        self.calls[function].append(command.name)
+                if function is not None:
+                    self.sizes[function] += 1
+
+    def reachable(self, roots: typing.Iterable[str] = ("Sys.init",)
+                  ) -> typing.Set[str]:
+        """
+        Args:
+            roots (typing.Iterable[str]): the entry points of the program.
+
+        Returns:
+            typing.Set[str]: the functions that can be reached from the roots
+            or from top-level code, including the roots themselves.
+        """
+        reached = set()
+        pending = list(roots) + self.top_level_calls
+        while pending:
+            function = pending.pop()
+            if function in reached:
+                continue
+            reached.add(function)
+            pending.extend(self.calls.get(function, ()))
+        return reached & self.calls.keys()
+
+    @staticmethod
+    def live_commands(commands: typing.Iterable[Command],
+                      live: typing.Set[str]) -> typing.Iterator[Command]:
+        """Drops the functions that are not live.
+
+        Args:
+            commands (typing.Iterable[Command]): the commands of a file.
+            live (typing.Set[str]): the functions to keep.
+
+        Returns:
+            typing.Iterator[Command]: the top-level commands, and the commands
+            of the live functions.
+        """
+        keep = True
+        for command in commands:
+            if command.opcode == FUNCTION:
+                keep = command.name in live
+            if keep:
+                yield command
@@ -8,19 +8,84 @@ Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 import typing
 
 
+# Entry points of the shared call and return routines.
+CALL_ROUTINE = "__VM_CALL"
+RETURN_ROUTINE = "__VM_RETURN"
+
+# Entry points of the shared comparison routines.
+COMPARISON_ROUTINES = {"eq": "__VM_EQ", "lt": "__VM_LT", "gt": "__VM_GT"}
+
+# Arithmetic commands that work on a stack top cached in D: the comp of the
+# result, with x in M and y in D, or the operand in D.
+CACHED_BINARY = {"add": "D+M", "sub": "M-D", "and": "D&M", "or": "D|M"}
+CACHED_UNARY = {"neg": "-D", "not": "!D"}
+
+# The base pointers of the segments that are addressed through one.
+SEGMENT_BASES = {"local": "LCL", "argument": "ARG", "this": "THIS",
+                 "that": "THAT"}
+
+# Entries of these segments up to this index are addressed with a chain of
+# A=A+1 from the base, instead of by adding the index in D. D is free when
+# pushing, and then adding the index is as short from index 3 on.
+MAX_CHAIN = 7
+MAX_CHAIN_D_FREE = 3
+
+
 class CodeWriter:
-    """Translates VM commands into Hack assembly code."""
+    """Translates VM commands into Hack assembly code.
+
+    By default, every call and return is translated inline. In shared-calls
+    mode, the bootstrap code is followed by a single global call routine and
+    a single global return routine. A call site then only loads the return
+    address, the target and the number of arguments, and jumps to the call
+    routine, and a return is a jump to the return routine. This costs a few
+    cycles per call but saves about 80 instructions of ROM per function.
+
+    Likewise, in shared-comparisons mode every eq, lt and gt is a jump to one
+    of three shared comparison routines, instead of a 40 instruction inline
+    sequence.
+
+    In stack-top caching mode, the top of the stack may be kept in D instead
+    of in RAM[SP-1]. Pushes load their value into D, and arithmetic and pops
+    use the cached value directly, so a chain of commands such as
+    "push, push, add, pop" never stores and reloads its intermediate values.
+    The cache is flushed, that is, D is pushed for real, before every command
+    that needs the stack in RAM, and before labels, calls and branches, since
+    those are where basic blocks begin and end.
+
+    The code is collected in the instructions list, one line of assembly per
+    entry, and only written to the output stream by write_out, so a pass can
+    still inspect or rewrite it before then.
+    """
     label_count = 0
     call_counter = 0
 
-    def __init__(self, output_stream: typing.TextIO) -> None:
+    def __init__(self, output_stream: typing.TextIO,
+                 shared_calls: bool = False,
+                 shared_comparisons: bool = False,
+                 cache_stack_top: bool = False) -> None:
         """Initializes the CodeWriter.
 
         Args:
             output_stream (typing.TextIO): output stream.
+            shared_calls (bool): translate calls and returns into jumps to
+                shared routines, which bootstrap_write emits.
+            shared_comparisons (bool): translate eq, lt and gt into jumps to
+                shared routines, which bootstrap_write emits.
+            cache_stack_top (bool): keep the top of the stack in D across
+                commands when possible. flush_stack_top must be called after
+                the last command, and write_out after that.
         """
         self.__output_stream = output_stream
+        # The lines of assembly not written out yet, each with its line break.
+        self.instructions = []
+        self.__write = self.instructions.append
         self.input_filename = None
+        self.shared_calls = shared_calls
+        self.shared_comparisons = shared_comparisons
+        self.cache_stack_top = cache_stack_top
+        # True if the top of the stack is in D and not yet pushed.
+        self.__top_in_d = False
         self.__output_stream.write("")
 
     def bootstrap_write(self):
@@ -28,12 +93,24 @@ class CodeWriter:
                Writes the VM bootstrap code to initialize the stack and call Sys.init.
 
                This method sets the stack pointer to address 256 and invokes the Sys.init function.
+               In the shared modes, it is also followed by the shared routines.
                """
-        self.__output_stream.write("@256\n")
-        self.__output_stream.write("D=A\n")
-        self.__output_stream.write("@SP\n")
-        self.__output_stream.write("M=D\n")
+        self.__write("@256\n")
+        self.__write("D=A\n")
+        self.__write("@SP\n")
+        self.__write("M=D\n")
         self.write_call("Sys.init", 0)
+        if self.shared_calls:
+            self.write_call_routine()
+            self.__write("(" + RETURN_ROUTINE + ")\n")
+            self.write_return_inline()
+        if self.shared_comparisons:
+            for cond, routine in COMPARISON_ROUTINES.items():
+                self.__write("(" + routine + ")\n")
+                self.write_comparison(cond, routine + "$")
+                self.__write("@R13\n")
+                self.__write("A=M\n")
+                self.__write("0;JMP\n")
 
     def set_file_name(self, filename: str) -> None:
         """Informs the code writer that the translation of a new VM file is
@@ -53,6 +130,14 @@ class CodeWriter:
         Args:
             command (str): an arithmetic command.
         """
+        if self.cache_stack_top and command in CACHED_BINARY:
+            self.cached_binary(command)
+            return
+        if self.__top_in_d and command in CACHED_UNARY:
+            self.__write("// " + command + "\n")
+            self.__write("D=" + CACHED_UNARY[command] + "\n")
+            return
+        self.flush_stack_top()
         if command == "add":
             self.if_add()
         elif command == "sub":
@@ -85,6 +170,17 @@ class CodeWriter:
             segment (str): the memory segment to operate on.
             index (int): the index in the memory segment.
         """
+        if command == "C_PUSH" and self.cache_stack_top:
+            self.flush_stack_top()
+            self.__write("// push " + segment + " " + str(index) + "\n")
+            self.load_segment(segment, index)
+            self.__top_in_d = True
+            return
+        if command == "C_POP" and self.__top_in_d:
+            self.__write("// pop " + segment + " " + str(index) + "\n")
+            self.store_segment(segment, index)
+            self.__top_in_d = False
+            return
         if command == "C_POP":
             self.if_pop(segment, index)
         else:
@@ -94,8 +190,134 @@ class CodeWriter:
         """
                Closes the output stream.
                """
+        self.flush_stack_top()
+        self.write_out()
         self.__output_stream.close()
 
+    def write_out(self) -> None:
+        """Writes the collected instructions to the output stream, at once,
+        and empties the list."""
+        self.__output_stream.write("".join(self.instructions))
+        self.instructions.clear()
+
+    def flush_stack_top(self) -> None:
+        """
+        Pushes the stack top cached in D, if there is one, so that the stack
+        is entirely in RAM again.
+        """
+        if self.__top_in_d:
+            self.__write("@SP\n")
+            self.__write("AM=M+1\n")
+            self.__write("A=A-1\n")
+            self.__write("M=D\n")
+            self.__top_in_d = False
+
+    def cached_binary(self, command: str) -> None:
+        """
+        Performs a binary arithmetic command in stack-top caching mode, and
+        leaves the result cached in D.
+
+        Args:
+            command (str): one of the commands of CACHED_BINARY.
+        """
+        self.__write("// " + command + "\n")
+        if not self.__top_in_d:
+            # D = y
+            self.__write("@SP\n")
+            self.__write("AM=M-1\n")
+            self.__write("D=M\n")
+        # M = x, popped
+        self.__write("@SP\n")
+        self.__write("AM=M-1\n")
+        self.__write("D=" + CACHED_BINARY[command] + "\n")
+        self.__top_in_d = True
+
+    def load_segment(self, segment: str, index: int) -> None:
+        """
+        Loads the value of a segment entry into D.
+
+        Args:
+            segment (str): The memory segment.
+            index (int): The index within the segment.
+        """
+        if segment == "constant":
+            self.__write("@" + str(index) + "\n")
+            self.__write("D=A\n")
+            return
+        if segment in SEGMENT_BASES and int(index) > MAX_CHAIN_D_FREE:
+            self.__write("@" + str(index) + "\n")
+            self.__write("D=A\n")
+            self.__write("@" + SEGMENT_BASES[segment] + "\n")
+            self.__write("A=D+M\n")
+        else:
+            self.write_address(segment, index)
+        self.__write("D=M\n")
+
+    def store_segment(self, segment: str, index: int) -> None:
+        """
+        Stores D into a segment entry.
+
+        Args:
+            segment (str): The memory segment, which is not "constant".
+            index (int): The index within the segment.
+        """
+        if self.is_direct(segment, index):
+            self.write_address(segment, index)
+            self.__write("M=D\n")
+        else:
+            # make_add needs D, so the value waits in R14
+            self.__write("@R14\n")
+            self.__write("M=D\n")
+            self.make_add(segment, index)
+            self.__write("@R14\n")
+            self.__write("D=M\n")
+            self.__write("@R13\n")
+            self.__write("A=M\n")
+            self.__write("M=D\n")
+
+    @staticmethod
+    def is_direct(segment: str, index: int) -> bool:
+        """
+        Args:
+            segment (str): The memory segment, which is not "constant".
+            index (int): The index within the segment.
+
+        Returns:
+            bool: True if write_address can address the entry.
+        """
+        return segment not in SEGMENT_BASES or int(index) <= MAX_CHAIN
+
+    def write_address(self, segment: str, index: int) -> None:
+        """
+        Sets A to the address of a segment entry, without using D or R13.
+        The addresses of static, temp and pointer entries are known when
+        translating, and small indices of the other segments are reached with
+        a chain of A=A+1 from their base. Should be called only if is_direct.
+
+        Args:
+            segment (str): The memory segment, which is not "constant".
+            index (int): The index within the segment.
+        """
+        index = int(index)
+        if segment == "pointer":  # this=3, that=4
+            self.__write("@THIS\n" if index == 0 else "@THAT\n")
+        elif segment == "temp":
+            if index + 5 > 12:
+                raise ValueError("problem detected")
+            self.__write("@" + str(index + 5) + "\n")
+        elif segment == "static":
+            if index > 240:
+                raise ValueError("problem detected")
+            self.__write("@" + self.input_filename + "." + str(index) + "\n")
+        else:
+            self.__write("@" + SEGMENT_BASES[segment] + "\n")
+            if index == 0:
+                self.__write("A=M\n")
+            else:
+                self.__write("A=M+1\n")
+                for _ in range(index - 1):
+                    self.__write("A=A+1\n")
+
     def write_label(self, label: str) -> None:
         """Writes assembly code that affects the label command.
         Let "Xxx.foo" be a function within the file Xxx.vm. The handling of
@@ -107,8 +329,9 @@ class CodeWriter:
         Args:
             label (str): the label to write.
         """
-        self.__output_stream.write("//***************** + label  " + "\n")
-        self.__output_stream.write("(" + label + ")" + "\n")
+        self.flush_stack_top()
+        self.__write("//***************** + label  " + "\n")
+        self.__write("(" + label + ")" + "\n")
 
     def write_goto(self, label: str) -> None:
         """Writes assembly code that affects the goto command.
@@ -116,9 +339,10 @@ class CodeWriter:
         Args:
             label (str): the label to go to.
         """
-        self.__output_stream.write("//goto" + label + "\n")
-        self.__output_stream.write("@" + label + "\n")
-        self.__output_stream.write("0;JMP\n")
+        self.flush_stack_top()
+        self.__write("//goto" + label + "\n")
+        self.__write("@" + label + "\n")
+        self.__write("0;JMP\n")
 
     def write_if(self, label: str) -> None:
         """Writes assembly code that affects the if-goto command.
@@ -126,13 +350,18 @@ class CodeWriter:
         Args:
             label (str): the label to go to.
         """
-        self.__output_stream.write("//if-goto " + label + "\n")
-        self.__output_stream.write("@SP\n")
-        self.__output_stream.write("M=M-1\n")
-        self.__output_stream.write("A=M\n")
-        self.__output_stream.write("D=M\n")
-        self.__output_stream.write("@" + label + "\n")
-        self.__output_stream.write("D;JNE\n")
+        self.__write("//if-goto " + label + "\n")
+        if self.__top_in_d:
+            self.__write("@" + label + "\n")
+            self.__write("D;JNE\n")
+            self.__top_in_d = False
+            return
+        self.__write("@SP\n")
+        self.__write("M=M-1\n")
+        self.__write("A=M\n")
+        self.__write("D=M\n")
+        self.__write("@" + label + "\n")
+        self.__write("D;JNE\n")
 
     def write_function(self, function_name: str, n_vars: int) -> None:
         """
@@ -150,12 +379,13 @@ class CodeWriter:
             function_name (str): The name of the function.
             n_vars (int): The number of local variables in the function.
         """
+        self.flush_stack_top()
 
-        self.__output_stream.write("(" + function_name + ")" + "\n")
+        self.__write("(" + function_name + ")" + "\n")
         for i in range(int(n_vars)):
-            self.__output_stream.write("@SP\n")
-            self.__output_stream.write("A=M\n")
-            self.__output_stream.write("M=0\n")
+            self.__write("@SP\n")
+            self.__write("A=M\n")
+            self.__write("M=0\n")
             self.sp_down_or_up("up")
 
     def write_call(self, function_name: str, n_args: int) -> None:
@@ -178,15 +408,32 @@ class CodeWriter:
             function_name (str): The name of the function to call.
             n_args (int): The number of arguments passed to the function.
         """
+        self.flush_stack_top()
 
         ret_add = function_name + "$ret." + str(CodeWriter.call_counter)
         CodeWriter.call_counter += 1
 
-        self.__output_stream.write("@" + ret_add + "\n")
-        self.__output_stream.write("D=A\n")
-        self.__output_stream.write("@SP\n")
-        self.__output_stream.write("A=M\n")
-        self.__output_stream.write("M=D\n")
+        if self.shared_calls:
+            # R13 = return address, R14 = function, D = 5 + n_args
+            self.__write("@" + ret_add + "\n")
+            self.__write("D=A\n")
+            self.__write("@R13\n")
+            self.__write("M=D\n")
+            self.__write("@" + function_name + "\n")
+            self.__write("D=A\n")
+            self.__write("@R14\n")
+            self.__write("M=D\n")
+            self.__write("@" + str(5 + int(n_args)) + "\n")
+            self.__write("D=A\n")
+            self.write_goto(CALL_ROUTINE)
+            self.__write("(" + ret_add + ")\n")
+            return
+
+        self.__write("@" + ret_add + "\n")
+        self.__write("D=A\n")
+        self.__write("@SP\n")
+        self.__write("A=M\n")
+        self.__write("M=D\n")
         self.sp_down_or_up("up")
 
         # Push LCL, ARG, THIS, THAT
@@ -196,27 +443,75 @@ class CodeWriter:
         self.push_val_in_sp("THAT")
 
         # ARG = SP - 5 - n_args
-        self.__output_stream.write("@SP\n")
-        self.__output_stream.write("D=M\n")
+        self.__write("@SP\n")
+        self.__write("D=M\n")
         num_of_diss = 5 + int(n_args)
-        self.__output_stream.write("@" + str(num_of_diss) + "\n")
-        self.__output_stream.write("D=D-A\n")
-        self.__output_stream.write("@ARG\n")
-        self.__output_stream.write("M=D\n")
+        self.__write("@" + str(num_of_diss) + "\n")
+        self.__write("D=D-A\n")
+        self.__write("@ARG\n")
+        self.__write("M=D\n")
 
         # LCL = SP
-        self.__output_stream.write("@SP\n")
-        self.__output_stream.write("D=M\n")
-        self.__output_stream.write("@LCL\n")
-        self.__output_stream.write("M=D\n")
+        self.__write("@SP\n")
+        self.__write("D=M\n")
+        self.__write("@LCL\n")
+        self.__write("M=D\n")
 
         # Goto function_name
         self.write_goto(function_name)
 
         # Define return label
-        self.__output_stream.write("(" + ret_add + ")\n")
+        self.__write("(" + ret_add + ")\n")
+
+    def write_call_routine(self) -> None:
+        """
+        Writes the shared call routine, see write_call.
+
+        Expects the return address in R13, the function to call in R14, and
+        5 + n_args in D. Pushes the frame of the caller, repositions ARG and
+        LCL, and jumps to the function.
+        """
+        self.__write("(" + CALL_ROUTINE + ")\n")
+        self.__write("@R15\n")
+        self.__write("M=D\n")
+
+        self.push_val_in_sp("R13")
+        self.push_val_in_sp("LCL")
+        self.push_val_in_sp("ARG")
+        self.push_val_in_sp("THIS")
+        self.push_val_in_sp("THAT")
+
+        # ARG = SP - 5 - n_args
+        self.__write("@SP\n")
+        self.__write("D=M\n")
+        self.__write("@R15\n")
+        self.__write("D=D-M\n")
+        self.__write("@ARG\n")
+        self.__write("M=D\n")
+
+        # LCL = SP
+        self.__write("@SP\n")
+        self.__write("D=M\n")
+        self.__write("@LCL\n")
+        self.__write("M=D\n")
+
+        # Goto function_name
+        self.__write("@R14\n")
+        self.__write("A=M\n")
+        self.__write("0;JMP\n")
 
     def write_return(self) -> None:
+        """
+        Writes assembly code that implements the 'return' command, which in
+        shared-calls mode is a jump to the shared return routine.
+        """
+        self.flush_stack_top()
+        if self.shared_calls:
+            self.write_goto(RETURN_ROUTINE)
+        else:
+            self.write_return_inline()
+
+    def write_return_inline(self) -> None:
         """
         Writes assembly code that implements the 'return' command.
 
@@ -232,34 +527,34 @@ class CodeWriter:
         """
 
         # endFrame(R15) = LCL
-        self.__output_stream.write("@LCL\n")
-        self.__output_stream.write("D=M\n")
-        self.__output_stream.write("@R15\n")
-        self.__output_stream.write("M=D\n")
+        self.__write("@LCL\n")
+        self.__write("D=M\n")
+        self.__write("@R15\n")
+        self.__write("M=D\n")
 
         # return_address (R14) = *(frame-5) (R15-5)
-        self.__output_stream.write("@5\n")
-        self.__output_stream.write("D=A\n")
-        self.__output_stream.write("@R15\n")
-        self.__output_stream.write("D=M-D\n")
-        self.__output_stream.write("A=D\n")
-        self.__output_stream.write("D=M\n")
-        self.__output_stream.write("@R14\n")
-        self.__output_stream.write("M=D\n")
+        self.__write("@5\n")
+        self.__write("D=A\n")
+        self.__write("@R15\n")
+        self.__write("D=M-D\n")
+        self.__write("A=D\n")
+        self.__write("D=M\n")
+        self.__write("@R14\n")
+        self.__write("M=D\n")
 
         # *ARG = pop()
-        self.__output_stream.write("@SP\n")
-        self.__output_stream.write("A=M-1\n")
-        self.__output_stream.write("D=M\n")  # D contains the last argument in the stack
-        self.__output_stream.write("@ARG\n")
-        self.__output_stream.write("A=M\n")
-        self.__output_stream.write("M=D\n")  # last argument in the stack saved in *ARG
+        self.__write("@SP\n")
+        self.__write("A=M-1\n")
+        self.__write("D=M\n")  # D contains the last argument in the stack
+        self.__write("@ARG\n")
+        self.__write("A=M\n")
+        self.__write("M=D\n")  # last argument in the stack saved in *ARG
 
         # SP = ARG + 1
-        self.__output_stream.write("@ARG\n")
-        self.__output_stream.write("D=M+1\n")
-        self.__output_stream.write("@SP\n")
-        self.__output_stream.write("M=D\n")
+        self.__write("@ARG\n")
+        self.__write("D=M+1\n")
+        self.__write("@SP\n")
+        self.__write("M=D\n")
 
         # Restore THAT, THIS, ARG, and LCL
         self.framing(1, "THAT")
@@ -268,9 +563,9 @@ class CodeWriter:
         self.framing(4, "LCL")
 
         # goto return_address (R14)
-        self.__output_stream.write("@R14\n")
-        self.__output_stream.write("A=M\n")
-        self.__output_stream.write("0;JMP\n")
+        self.__write("@R14\n")
+        self.__write("A=M\n")
+        self.__write("0;JMP\n")
 
     def framing(self, val: int, spot: str) -> None:
         """
@@ -283,14 +578,14 @@ class CodeWriter:
             spot (str): The segment name to restore (e.g., "THAT", "THIS").
         """
 
-        self.__output_stream.write("@" + str(val) + "\n")
-        self.__output_stream.write("D=A\n")
-        self.__output_stream.write("@R15\n")  # @endFrame
-        self.__output_stream.write("D=M-D\n")  # endFrame - val
-        self.__output_stream.write("A=D\n")
-        self.__output_stream.write("D=M\n")
-        self.__output_stream.write("@" + spot + "\n")
-        self.__output_stream.write("M=D\n")  # Restore value to segment
+        self.__write("@" + str(val) + "\n")
+        self.__write("D=A\n")
+        self.__write("@R15\n")  # @endFrame
+        self.__write("D=M-D\n")  # endFrame - val
+        self.__write("A=D\n")
+        self.__write("D=M\n")
+        self.__write("@" + spot + "\n")
+        self.__write("M=D\n")  # Restore value to segment
 
     def sp_down_or_up(self, instruction: str) -> None:
         """
@@ -301,69 +596,69 @@ class CodeWriter:
         """
 
         if instruction == "up":
-            self.__output_stream.write("@SP\n")
-            self.__output_stream.write("M=M+1\n")
+            self.__write("@SP\n")
+            self.__write("M=M+1\n")
         else:
-            self.__output_stream.write("@SP\n")
-            self.__output_stream.write("M=M-1\n")
+            self.__write("@SP\n")
+            self.__write("M=M-1\n")
 
     def if_add(self) -> None:
         """
         Performs addition on the top two stack values and stores the result.
         """
-        self.__output_stream.write("// add\n")
-        self.__output_stream.write("@SP\n")
-        self.__output_stream.write("A=M-1\n")
-        self.__output_stream.write("D=M\n")
-        self.__output_stream.write("A=A-1\n")
-        self.__output_stream.write("D=D+M\n")
-        self.__output_stream.write("M=D\n")
+        self.__write("// add\n")
+        self.__write("@SP\n")
+        self.__write("A=M-1\n")
+        self.__write("D=M\n")
+        self.__write("A=A-1\n")
+        self.__write("D=D+M\n")
+        self.__write("M=D\n")
         self.sp_down_or_up("down")
 
     def if_sub(self) -> None:
         """
         Performs subtraction on the top two stack values and stores the result.
         """
-        self.__output_stream.write("// sub\n")
-        self.__output_stream.write("@SP\n")
-        self.__output_stream.write("A=M-1\n")
-        self.__output_stream.write("D=M\n")
-        self.__output_stream.write("A=A-1\n")
-        self.__output_stream.write("M=M-D\n")
+        self.__write("// sub\n")
+        self.__write("@SP\n")
+        self.__write("A=M-1\n")
+        self.__write("D=M\n")
+        self.__write("A=A-1\n")
+        self.__write("M=M-D\n")
         self.sp_down_or_up("down")
 
     def if_neg(self) -> None:
         """
         Negates the top value of the stack.
         """
-        self.__output_stream.write("// neg\n")
-        self.__output_stream.write("@SP\n")
-        self.__output_stream.write("A=M-1\n")
-        self.__output_stream.write("M=-M\n")
+        self.__write("// neg\n")
+        self.__write("@SP\n")
+        self.__write("A=M-1\n")
+        self.__write("M=-M\n")
 
     def if_not(self) -> None:
         """
         Applies logical NOT to the top value of the stack.
         """
-        self.__output_stream.write("@SP\n")
-        self.__output_stream.write("A=M-1\n")
-        self.__output_stream.write("M=!M\n")
+        self.__write("@SP\n")
+        self.__write("A=M-1\n")
+        self.__write("M=!M\n")
 
     def if_shift_right(self) -> None:
         """
         Performs a bitwise right shift on the top value of the stack.
         """
-        self.__output_stream.write("@SP\n")
-        self.__output_stream.write("A=M-1\n")
-        self.__output_stream.write("M=M>>1\n")
+        self.__write("@SP\n")
+        self.__write("A=M-1\n")
+        self.__write("M=M>>1\n")
 
     def if_shift_left(self) -> None:
         """
         Performs a bitwise left shift on the top value of the stack.
         """
-        self.__output_stream.write("@SP\n")
-        self.__output_stream.write("A=M-1\n")
-        self.__output_stream.write("M=M<<1\n")
+        self.__write("@SP\n")
+        self.__write("A=M-1\n")
+        self.__write("M=M<<1\n")
 
     def if_and_or(self, sel: str) -> None:
         """
@@ -373,128 +668,113 @@ class CodeWriter:
             sel (str): "and" for bitwise AND, any other value for bitwise OR.
         """
         self.sp_down_or_up("down")
-        self.__output_stream.write("A=M\n")
-        self.__output_stream.write("D=M\n")
-        self.__output_stream.write("A=A-1\n")
+        self.__write("A=M\n")
+        self.__write("D=M\n")
+        self.__write("A=A-1\n")
 
         if sel == "and":
-            self.__output_stream.write("D=D&M\n")
+            self.__write("D=D&M\n")
         else:
-            self.__output_stream.write("D=D|M\n")
+            self.__write("D=D|M\n")
 
-        self.__output_stream.write("M=D\n")
+        self.__write("M=D\n")
 
-    def make_add(self, segment: str, index: str) -> None:
+    def make_add(self, segment: str, index: int) -> None:
         """
         Computes the effective address for a given segment and index,
         storing the result in R13.
 
         Args:
             segment (str): The memory segment (e.g., "local", "argument", "this", "that", "temp", "static").
-            index (str): The index within the segment.
+            index (int): The index within the segment.
         """
 
         if segment in ["local", "argument", "this", "that"]:
             segment_map = {"local": "LCL", "argument": "ARG", "this": "THIS", "that": "THAT"}
             segment = segment_map[segment]
 
-            self.__output_stream.write("@" + index + "\n")
-            self.__output_stream.write("D=A\n")
-            self.__output_stream.write("@" + segment + "\n")
-            self.__output_stream.write("D=D+M\n")
-            self.__output_stream.write("@R13\n")
-            self.__output_stream.write("M=D\n")
+            self.__write("@" + str(index) + "\n")
+            self.__write("D=A\n")
+            self.__write("@" + segment + "\n")
+            self.__write("D=D+M\n")
+            self.__write("@R13\n")
+            self.__write("M=D\n")
 
         elif segment == "temp":
             index = str(int(index) + 5)
             if int(index) > 12:
                 raise ValueError("problem detected")
-            self.__output_stream.write("@" + index + "\n")
-            self.__output_stream.write("D=A\n")
-            self.__output_stream.write("@R13\n")
-            self.__output_stream.write("M=D\n")
+            self.__write("@" + index + "\n")
+            self.__write("D=A\n")
+            self.__write("@R13\n")
+            self.__write("M=D\n")
 
         elif segment == "static":
             ind = str(int(index))
             if int(ind) > 240:
                 raise ValueError("problem detected")
-            self.__output_stream.write("@" + self.input_filename + "." + ind + "\n")
-            self.__output_stream.write("D=A\n")
-            self.__output_stream.write("@R13\n")
-            self.__output_stream.write("M=D\n")
+            self.__write("@" + self.input_filename + "." + ind + "\n")
+            self.__write("D=A\n")
+            self.__write("@R13\n")
+            self.__write("M=D\n")
 
-    def if_pop(self, segment: str, index: str) -> None:
+    def if_pop(self, segment: str, index: int) -> None:
         """
         Handles the 'pop' command by storing the top stack value into the given memory segment.
 
         Args:
             segment (str): The memory segment (e.g., "local", "argument", "pointer").
-            index (str): The index within the segment.
+            index (int): The index within the segment.
         """
-        self.__output_stream.write("// pop " + segment + " " + index + "\n")
-        self.sp_down_or_up("down\n")
+        self.__write("// pop " + segment + " " + str(index) + "\n")
 
-        if segment == "pointer":
-            self.__output_stream.write("A=M\n")
-            self.__output_stream.write("D=M\n")
-            if int(index) == 0:
-                self.__output_stream.write("@THIS\n")
-            else:
-                self.__output_stream.write("@THAT\n")
-            self.__output_stream.write("M=D\n")
+        if self.is_direct(segment, index):
+            self.__write("@SP\n")
+            self.__write("AM=M-1\n")
+            self.__write("D=M\n")  # D = the value to pop
+            self.write_address(segment, index)
+            self.__write("M=D\n")
         else:
+            self.sp_down_or_up("down")
             self.make_add(segment, index)
-            self.__output_stream.write("@SP\n")
-            self.__output_stream.write("A=M\n")
-            self.__output_stream.write("D=M\n")  # D = the value to pop
-            self.__output_stream.write("@R13\n")
-            self.__output_stream.write("A=M\n")
-            self.__output_stream.write("M=D\n")
+            self.__write("@SP\n")
+            self.__write("A=M\n")
+            self.__write("D=M\n")  # D = the value to pop
+            self.__write("@R13\n")
+            self.__write("A=M\n")
+            self.__write("M=D\n")
 
-    def if_push(self, segment: str, index: str) -> None:
+    def if_push(self, segment: str, index: int) -> None:
         """
         Handles the 'push' command by retrieving the value from the given memory segment and pushing it onto the stack.
 
         Args:
             segment (str): The memory segment (e.g., "constant", "pointer").
-            index (str): The index within the segment.
+            index (int): The index within the segment.
         """
-        self.__output_stream.write("// push " + segment + " " + index + "\n")
+        self.__write("// push " + segment + " " + str(index) + "\n")
 
         if segment == "constant":
             self.push_constant(index)
-        elif segment == "pointer":  # this=3, that=4
-            if int(index) == 0:
-                self.__output_stream.write("@THIS\n")
-            else:
-                self.__output_stream.write("@THAT\n")
-            self.__output_stream.write("D=M\n")
-            self.__output_stream.write("@SP\n")
-            self.__output_stream.write("A=M\n")
-            self.__output_stream.write("M=D\n")
-            self.sp_down_or_up("up")
         else:
-            self.make_add(segment, index)
-            self.__output_stream.write("@R13\n")
-            self.__output_stream.write("A=M\n")
-            self.__output_stream.write("D=M\n")
-            self.__output_stream.write("@SP\n")
-            self.__output_stream.write("A=M\n")
-            self.__output_stream.write("M=D\n")
+            self.load_segment(segment, index)
+            self.__write("@SP\n")
+            self.__write("A=M\n")
+            self.__write("M=D\n")
             self.sp_down_or_up("up")
 
-    def push_constant(self, index: str) -> None:
+    def push_constant(self, index: int) -> None:
         """
         Pushes a constant value onto the stack.
 
         Args:
-            index (str): The constant value to push.
+            index (int): The constant value to push.
         """
-        self.__output_stream.write("@" + index + "\n")
-        self.__output_stream.write("D=A\n")
-        self.__output_stream.write("@SP\n")
-        self.__output_stream.write("A=M\n")
-        self.__output_stream.write("M=D\n")
+        self.__write("@" + str(index) + "\n")
+        self.__write("D=A\n")
+        self.__write("@SP\n")
+        self.__write("A=M\n")
+        self.__write("M=D\n")
         self.sp_down_or_up("up")
 
     def if_eq_lt_gt(self, cond: str, label: str) -> None:
@@ -508,73 +788,98 @@ class CodeWriter:
 
         CodeWriter.label_count += 1
 
+        if self.shared_comparisons:
+            # R13 = return address, then jump to the shared routine
+            ret_add = label + "CMP" + str(CodeWriter.label_count)
+            self.__write("@" + ret_add + "\n")
+            self.__write("D=A\n")
+            self.__write("@R13\n")
+            self.__write("M=D\n")
+            self.write_goto(COMPARISON_ROUTINES[cond])
+            self.__write("(" + ret_add + ")\n")
+        else:
+            self.write_comparison(cond, label, str(CodeWriter.label_count))
+
+    def write_comparison(self, cond: str, label: str, suffix: str = "") -> None:
+        """
+        Writes the overflow-safe comparison of the top two stack values, which
+        replaces them with the result.
+
+        Args:
+            cond (str): The comparison condition ("eq", "lt", "gt").
+            label (str): The prefix of the labels of the sequence.
+            suffix (str): The suffix of the labels of the sequence.
+        """
+
         # SP down
         self.sp_down_or_up("down")
-        self.__output_stream.write("A=M\n")
-        self.__output_stream.write("D=M\n")
+        self.__write("A=M\n")
+        self.__write("D=M\n")
 
         # Check conditions and jump accordingly
-        self.__output_stream.write("@" + label + "Ypos" + str(CodeWriter.label_count) + "\n")
-        self.__output_stream.write("D;JGE\n")
+        self.__write("@" + label + "Ypos" + suffix + "\n")
+        self.__write("D;JGE\n")
 
         self.sp_down_or_up("down")
-        self.__output_stream.write("A=M\n")
-        self.__output_stream.write("D=M\n")
+        self.__write("A=M\n")
+        self.__write("D=M\n")
 
-        self.__output_stream.write("@" + label + "XposYneg" + str(CodeWriter.label_count) + "\n")
-        self.__output_stream.write("D;JGE\n")
+        self.__write("@" + label + "XposYneg" + suffix + "\n")
+        self.__write("D;JGE\n")
 
-        self.__output_stream.write("A=A+1\n")
-        self.__output_stream.write("D=M-D\n")
-        self.__output_stream.write("@" + label + "END_TEMP" + str(CodeWriter.label_count) + "\n")
-        self.__output_stream.write("0;JMP\n")
+        # Both negative: y is right above x
+        self.__write("@SP\n")
+        self.__write("A=M+1\n")
+        self.__write("D=M-D\n")
+        self.__write("@" + label + "END_TEMP" + suffix + "\n")
+        self.__write("0;JMP\n")
 
         # Handle X positive, Y negative case
-        self.__output_stream.write("(" + label + "XposYneg" + str(CodeWriter.label_count) + ")\n")
-        self.__output_stream.write("D=-1\n")
-        self.__output_stream.write("@" + label + "END_TEMP" + str(CodeWriter.label_count) + "\n")
-        self.__output_stream.write("0;JMP\n")
+        self.__write("(" + label + "XposYneg" + suffix + ")\n")
+        self.__write("D=-1\n")
+        self.__write("@" + label + "END_TEMP" + suffix + "\n")
+        self.__write("0;JMP\n")
 
         # Handle Y positive case
-        self.__output_stream.write("(" + label + "Ypos" + str(CodeWriter.label_count) + ")\n")
+        self.__write("(" + label + "Ypos" + suffix + ")\n")
         self.sp_down_or_up("down")
-        self.__output_stream.write("A=M\n")
-        self.__output_stream.write("D=M\n")
-        self.__output_stream.write("@" + label + "YposXpos" + str(CodeWriter.label_count) + "\n")
-        self.__output_stream.write("D;JGE\n")
-        self.__output_stream.write("D=1\n")
-        self.__output_stream.write("@" + label + "END_TEMP" + str(CodeWriter.label_count) + "\n")
-        self.__output_stream.write("0;JMP\n")
+        self.__write("A=M\n")
+        self.__write("D=M\n")
+        self.__write("@" + label + "YposXpos" + suffix + "\n")
+        self.__write("D;JGE\n")
+        self.__write("D=1\n")
+        self.__write("@" + label + "END_TEMP" + suffix + "\n")
+        self.__write("0;JMP\n")
 
         # Handle Y positive, X positive case
-        self.__output_stream.write("(" + label + "YposXpos" + str(CodeWriter.label_count) + ")\n")
-        self.__output_stream.write("@SP\n")
-        self.__output_stream.write("A=M+1\n")
-        self.__output_stream.write("D=M-D\n")
-        self.__output_stream.write("@" + label + "END_TEMP" + str(CodeWriter.label_count) + "\n")
-        self.__output_stream.write("0;JMP\n")
+        self.__write("(" + label + "YposXpos" + suffix + ")\n")
+        self.__write("@SP\n")
+        self.__write("A=M+1\n")
+        self.__write("D=M-D\n")
+        self.__write("@" + label + "END_TEMP" + suffix + "\n")
+        self.__write("0;JMP\n")
 
         # End temporary label
-        self.__output_stream.write("(" + label + "END_TEMP" + str(CodeWriter.label_count) + ")\n")
-        self.__output_stream.write("@" + label + "TRUELABEL" + str(CodeWriter.label_count) + "\n")
+        self.__write("(" + label + "END_TEMP" + suffix + ")\n")
+        self.__write("@" + label + "TRUELABEL" + suffix + "\n")
 
         if cond == "eq":
-            self.__output_stream.write("D;JEQ\n")
+            self.__write("D;JEQ\n")
         elif cond == "lt":
-            self.__output_stream.write("D;JGT\n")
+            self.__write("D;JGT\n")
         else:
-            self.__output_stream.write("D;JLT\n")
-
-        self.__output_stream.write("D=0\n")
-        self.__output_stream.write("@" + label + "END" + str(CodeWriter.label_count) + "\n")
-        self.__output_stream.write("0;JMP\n")
-
-        self.__output_stream.write("(" + label + "TRUELABEL" + str(CodeWriter.label_count) + ")\n")
-        self.__output_stream.write("D=-1\n")
-        self.__output_stream.write("(" + label + "END" + str(CodeWriter.label_count) + ")\n")
-        self.__output_stream.write("@SP\n")
-        self.__output_stream.write("A=M\n")
-        self.__output_stream.write("M=D\n")
+            self.__write("D;JLT\n")
+
+        self.__write("D=0\n")
+        self.__write("@" + label + "END" + suffix + "\n")
+        self.__write("0;JMP\n")
+
+        self.__write("(" + label + "TRUELABEL" + suffix + ")\n")
+        self.__write("D=-1\n")
+        self.__write("(" + label + "END" + suffix + ")\n")
+        self.__write("@SP\n")
+        self.__write("A=M\n")
+        self.__write("M=D\n")
         self.sp_down_or_up("up")
 
     def push_val_in_sp(self, val: str) -> None:
@@ -584,9 +889,9 @@ class CodeWriter:
         Args:
             val (str): The name of the memory segment whose value is to be pushed.
         """
-        self.__output_stream.write("@" + val + "\n")
-        self.__output_stream.write("D=M\n")
-        self.__output_stream.write("@SP\n")
-        self.__output_stream.write("A=M\n")
-        self.__output_stream.write("M=D\n")
+        self.__write("@" + val + "\n")
+        self.__write("D=M\n")
+        self.__write("@SP\n")
+        self.__write("A=M\n")
+        self.__write("M=D\n")
         self.sp_down_or_up("up")
@@ -0,0 +1,150 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from Parser import ADD, AND, CONSTANT, EQ, GT, LT, NEG, NOT, OR, PUSH, SUB, \
+    Command
+
+# Binary commands on two constants, as 16-bit signed values. Comparisons
+# return -1 for true and 0 for false.
+BINARY = {
+    ADD: lambda a, b: a + b,
+    SUB: lambda a, b: a - b,
+    AND: lambda a, b: a & b,
+    OR: lambda a, b: a | b,
+    EQ: lambda a, b: -(a == b),
+    GT: lambda a, b: -(a > b),
+    LT: lambda a, b: -(a < b),
+}
+
+UNARY = {
+    NEG: lambda a: -a,
+    NOT: lambda a: ~a,
+}
+
+# Binary commands whose result is the value below the top of the stack, when
+# the top is the given constant: x+0, x-0, x|0 and x&-1.
+IDENTITIES = {ADD: 0, SUB: 0, OR: 0, AND: -1}
+
+
+def to_signed(value: int) -> int:
+    """
+    Args:
+        value (int): any integer.
+
+    Returns:
+        int: the value truncated to 16 bits, as the Hack CPU would.
+    """
+    value &= 0xFFFF
+    return value - 0x10000 if value & 0x8000 else value
+
+
+class ConstantFolder:
+    """Folds constant expressions and drops identities in VM commands.
+
+    The folder works on a stream of commands, between the Parser and the
+    CodeWriter. Constants that are pushed are held back until a command needs
+    them on the stack: arithmetic on held constants is done here, so
+    "push constant 2, push constant 3, add" becomes "push constant 5", and
+    "push constant 0, not" is kept as it is. Adding or subtracting 0, or-ing
+    with 0 and and-ing with -1 are dropped, and so are two neg or two not in
+    a row.
+
+    Results outside 0..32767 cannot be pushed directly. A negative result v
+    is written as "push constant ~v, not", which is how the Jack compiler
+    writes true, and is never longer than what it replaces.
+
+    Any other command, and in particular every label, goto and call, writes
+    the held constants first, so nothing is folded across them.
+    """
+
+    def __init__(self) -> None:
+        """Creates a folder with empty statistics."""
+        # The commands read and written, over all files.
+        self.commands_in = 0
+        self.commands_out = 0
+
+    def fold(self, commands: typing.Iterable[Command]
+             ) -> typing.Iterator[Command]:
+        """
+        Args:
+            commands (typing.Iterable[Command]): the commands of a file.
+
+        Returns:
+            typing.Iterator[Command]: the simplified commands.
+        """
+        # The constants pushed and not written yet, and a neg or not of a
+        # value that is not a constant, which comes before them.
+        values = []
+        pending = None
+        for command in commands:
+            self.commands_in += 1
+            opcode = command.opcode
+            if opcode == PUSH and command.segment == CONSTANT:
+                values.append(command.index)
+                continue
+            if opcode in UNARY:
+                if values:
+                    values[-1] = to_signed(UNARY[opcode](values[-1]))
+                    continue
+                if pending is not None and pending.opcode == opcode:
+                    pending = None
+                    continue
+                if pending is None:
+                    pending = command
+                    continue
+            elif opcode in BINARY:
+                if len(values) >= 2:
+                    right = values.pop()
+                    values[-1] = to_signed(BINARY[opcode](values[-1], right))
+                    continue
+                if values and to_signed(values[-1]) == IDENTITIES.get(opcode):
+                    values.pop()
+                    continue
+
+            if pending is not None:
+                yield self.write(pending)
+            for value in values:
+                yield from self.push(value)
+            values.clear()
+            if opcode in UNARY:
+                pending = command
+            else:
+                pending = None
+                yield self.write(command)
+
+        if pending is not None:
+            yield self.write(pending)
+        for value in values:
+            yield from self.push(value)
+
+    def push(self, value: int) -> typing.Iterator[Command]:
+        """
+        Args:
+            value (int): a constant, either as it was pushed or as folded.
+
+        Returns:
+            typing.Iterator[Command]: the commands that push the constant.
+        """
+        if value < 0:
+            yield self.write(Command(PUSH, CONSTANT, ~value))
+            yield self.write(Command(NOT))
+        else:
+            yield self.write(Command(PUSH, CONSTANT, value))
+
+    def write(self, command: Command) -> Command:
+        """Counts a command that is written, and returns it."""
+        self.commands_out += 1
+        return command
+
+    def report(self) -> str:
+        """
+        Returns:
+            str: the number of commands the folder removed.
+        """
+        return "Folded %d VM commands into %d" % (self.commands_in,
+                                                   self.commands_out)
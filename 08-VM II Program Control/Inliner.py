@@ -0,0 +1,290 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import collections
+import typing
+from Parser import ARGUMENT, CALL, CONSTANT, FUNCTION, GOTO, IF_GOTO, LABEL, \
+    LAST_ARITHMETIC, LOCAL, NEG, NOT, POINTER, POP, PUSH, RETURN, SHIFT_LEFT, \
+    SHIFT_RIGHT, STATIC, TEMP, Command
+
+# The number of temp entries, which hold the arguments and locals of inlined
+# functions.
+TEMP_SIZE = 8
+
+# Arithmetic commands that pop one value and push one value.
+UNARY = frozenset((NEG, NOT, SHIFT_LEFT, SHIFT_RIGHT))
+
+
+class Inliner:
+    """Inlines small leaf functions at the VM level, across files.
+
+    A call "call F n" is replaced by a copy of the body of F when F calls no
+    function, has at most max_size commands, and its stack use is simple
+    enough to follow: every label is reached with the same stack depth, and
+    every return leaves exactly the return value. Its arguments, locals,
+    temp entries and saved pointers must also fit in temp. The copy starts by
+    popping the arguments into temp entries, and then uses temp entries for
+    the locals and the temp entries of F as well. A caller cannot expect temp
+    to survive a call, so these entries are free at every call site. If F
+    sets pointer 0 or 1, the copy saves and restores THIS or THAT around
+    itself, as return would. The labels of the copy get a unique prefix, and
+    returns jump to its end, at a label that F does not use.
+
+    Functions that use static are only inlined into the file they are
+    defined in, since static names belong to a file.
+    """
+
+    def __init__(self, max_size: int = 12) -> None:
+        """Creates an inliner.
+
+        Args:
+            max_size (int): the largest number of commands, not counting the
+                function command, of a function that is inlined.
+        """
+        self.max_size = max_size
+        # The call sites inlined, per function.
+        self.counts = collections.Counter()
+        self.__copies = 0
+
+    def inline(self, modules: typing.List[typing.Tuple[str, typing.List[Command]]]
+               ) -> typing.List[typing.Tuple[str, typing.List[Command]]]:
+        """Inlines every call of an inlinable function.
+
+        Args:
+            modules (typing.List[typing.Tuple[str, typing.List[Command]]]): the
+                (file name, commands) pairs of the program.
+
+        Returns:
+            typing.List[typing.Tuple[str, typing.List[Command]]]: the program
+            with the calls replaced. The inlined functions are kept, see
+            CallGraph for dropping those that are no longer called.
+        """
+        functions = {}
+        for input_filename, commands in modules:
+            for index, command in enumerate(commands):
+                if command.opcode == FUNCTION:
+                    body = self.function_body(commands, index + 1)
+                    if body is not None and self.is_inlinable(command, body):
+                        functions[command.name] = (input_filename, command,
+                                                   body)
+
+        inlined = []
+        for input_filename, commands in modules:
+            result = []
+            for command in commands:
+                function = functions.get(command.name) \
+                    if command.opcode == CALL else None
+                if function is None or not self.fits(
+                        command, input_filename, *function):
+                    result.append(command)
+                    continue
+                result.extend(self.expand(command.name, command.index,
+                                          function[1].index, function[2]))
+                self.counts[command.name] += 1
+            inlined.append((input_filename, result))
+        return inlined
+
+    def report(self) -> str:
+        """
+        Returns:
+            str: the number of call sites inlined, in total and per function.
+        """
+        return "Inlined %d call sites of %d functions%s" % (
+            sum(self.counts.values()), len(self.counts),
+            ": " + ", ".join("%s (%d)" % item for item in
+                             sorted(self.counts.items())) if self.counts else "")
+
+    def function_body(self, commands: typing.List[Command], start: int
+                      ) -> typing.Optional[typing.List[Command]]:
+        """
+        Args:
+            commands (typing.List[Command]): the commands of a file.
+            start (int): the index of the first command after "function".
+
+        Returns:
+            typing.Optional[typing.List[Command]]: the commands of the
+            function, or None if it is larger than max_size.
+        """
+        body = []
+        for index in range(start, len(commands)):
+            if commands[index].opcode == FUNCTION:
+                break
+            if len(body) == self.max_size:
+                return None
+            body.append(commands[index])
+        return body
+
+    @staticmethod
+    def is_inlinable(function: Command, body: typing.List[Command]) -> bool:
+        """
+        Args:
+            function (Command): the function command.
+            body (typing.List[Command]): the commands of the function.
+
+        Returns:
+            bool: True if the function can be inlined, see the class docstring.
+        """
+        if any(command.opcode == CALL for command in body):
+            return False
+        if any(command.segment == LOCAL and command.index >= function.index
+               for command in body):
+            return False
+        return Inliner.has_simple_stack(body)
+
+    @staticmethod
+    def fits(call: Command, input_filename: str, function_filename: str,
+             function: Command, body: typing.List[Command]) -> bool:
+        """
+        Args:
+            call (Command): the call command.
+            input_filename (str): the file of the call.
+            function_filename (str): the file of the function.
+            function (Command): the function command.
+            body (typing.List[Command]): the commands of the function.
+
+        Returns:
+            bool: True if the function can be inlined at this call site.
+        """
+        if function_filename != input_filename and any(
+                command.segment == STATIC for command in body):
+            return False
+        if any(command.segment == ARGUMENT and command.index >= call.index
+               for command in body):
+            return False
+        return call.index + function.index + Inliner.temps(body) \
+            + len(Inliner.saved_pointers(body)) <= TEMP_SIZE
+
+    @staticmethod
+    def temps(body: typing.List[Command]) -> int:
+        """
+        Returns:
+            int: the number of temp entries the function uses.
+        """
+        return max([command.index + 1 for command in body
+                    if command.segment == TEMP], default=0)
+
+    @staticmethod
+    def saved_pointers(body: typing.List[Command]) -> typing.List[int]:
+        """
+        Returns:
+            typing.List[int]: the pointer entries the function sets.
+        """
+        return sorted({command.index for command in body
+                       if command.opcode == POP
+                       and command.segment == POINTER})
+
+    @staticmethod
+    def has_simple_stack(body: typing.List[Command]) -> bool:
+        """
+        Args:
+            body (typing.List[Command]): the commands of a function.
+
+        Returns:
+            bool: True if the body never pops what it did not push, every
+            label is reached with a single stack depth, every return leaves
+            just the return value, and the body does not fall through its end.
+        """
+        depth = 0
+        reachable = True
+        label_depths = {}
+
+        def reach(label: str, label_depth: int) -> bool:
+            return label_depths.setdefault(label, label_depth) == label_depth
+
+        for command in body:
+            opcode = command.opcode
+            if opcode == LABEL:
+                if reachable:
+                    if not reach(command.name, depth):
+                        return False
+                elif command.name in label_depths:
+                    depth = label_depths[command.name]
+                else:
+                    return False
+                reachable = True
+                continue
+            if not reachable:
+                continue
+            if opcode == GOTO:
+                if not reach(command.name, depth):
+                    return False
+                reachable = False
+            elif opcode == IF_GOTO:
+                depth -= 1
+                if depth < 0 or not reach(command.name, depth):
+                    return False
+            elif opcode == RETURN:
+                if depth != 1:
+                    return False
+                reachable = False
+            elif opcode == PUSH:
+                depth += 1
+            elif opcode == POP or (opcode <= LAST_ARITHMETIC
+                                   and opcode not in UNARY):
+                depth -= 1
+            elif opcode in UNARY and depth < 1:
+                return False
+            if depth < 0:
+                return False
+        return not reachable
+
+    def expand(self, name: str, n_args: int, n_vars: int,
+               body: typing.List[Command]) -> typing.List[Command]:
+        """
+        Args:
+            name (str): the name of the function.
+            n_args (int): the number of arguments of the call.
+            n_vars (int): the number of locals of the function.
+            body (typing.List[Command]): the commands of the function.
+
+        Returns:
+            typing.List[Command]: the commands that replace the call.
+        """
+        self.__copies += 1
+        prefix = "%s.inline%d." % (name, self.__copies)
+        first_temp = n_args + n_vars
+        first_saved = first_temp + Inliner.temps(body)
+        saved = Inliner.saved_pointers(body)
+        remap = {ARGUMENT: 0, LOCAL: n_args, TEMP: first_temp}
+
+        expansion = []
+        for slot, pointer in enumerate(saved, first_saved):
+            expansion.append(Command(PUSH, POINTER, pointer))
+            expansion.append(Command(POP, TEMP, slot))
+        for argument in reversed(range(n_args)):
+            expansion.append(Command(POP, TEMP, argument))
+        for local in range(n_vars):
+            expansion.append(Command(PUSH, CONSTANT, 0))
+            expansion.append(Command(POP, TEMP, n_args + local))
+
+        # VM labels can be any name, so the join label is only known to be
+        # unique once it differs from every label of the body.
+        labels = {command.name for command in body if command.opcode == LABEL}
+        end = "END"
+        while end in labels:
+            end += "_"
+        returns = 0
+        for index, command in enumerate(body):
+            opcode = command.opcode
+            if opcode == RETURN:
+                if index != len(body) - 1:
+                    expansion.append(Command(GOTO, name=prefix + end))
+                    returns += 1
+            elif opcode in (LABEL, GOTO, IF_GOTO):
+                expansion.append(Command(opcode, name=prefix + command.name))
+            elif command.segment in remap:
+                expansion.append(Command(opcode, TEMP,
+                                         remap[command.segment]
+                                         + command.index))
+            else:
+                expansion.append(command)
+        if returns:
+            expansion.append(Command(LABEL, name=prefix + end))
+        for slot, pointer in enumerate(saved, first_saved):
+            expansion.append(Command(PUSH, TEMP, slot))
+            expansion.append(Command(POP, POINTER, pointer))
+        return expansion
@@ -5,14 +5,25 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import io
 import os
 import sys
 import typing
-from Parser import Parser
+from Parser import CALL, COMMANDS, FUNCTION, GOTO, IF_GOTO, LABEL, \
+    LAST_ARITHMETIC, POP, PUSH, RETURN, SEGMENTS, Command, Parser
 from CodeWriter import CodeWriter
+from CallGraph import CallGraph
+from ConstantFolder import ConstantFolder
+from Inliner import Inliner
 
 
-def translate_file(input_file: typing.TextIO, output_file: typing.TextIO, bootstrap: bool) -> None:
+def translate_file(input_file: typing.TextIO, output_file: typing.TextIO, bootstrap: bool,
+                   shared_calls: bool = False,
+                   shared_comparisons: bool = False,
+                   cache_stack_top: bool = False,
+                   constant_folder: typing.Optional[ConstantFolder] = None
+                   ) -> None:
     """
     Translates a single file from VM code to Hack assembly.
 
@@ -20,55 +31,206 @@ def translate_file(input_file: typing.TextIO, output_file: typing.TextIO, bootst
         input_file (typing.TextIO): The input VM file to translate.
         output_file (typing.TextIO): The output file where translated assembly code is written.
         bootstrap (bool): If True, writes bootstrap code at the beginning.
+        shared_calls (bool): see translate_commands.
+        shared_comparisons (bool): see translate_commands.
+        cache_stack_top (bool): see translate_commands.
+        constant_folder (typing.Optional[ConstantFolder]): if given, the
+            commands are simplified by it before they are translated.
     """
-
-    code_writer = CodeWriter(output_file)
-    parser = Parser(input_file)
     input_filename = os.path.splitext(os.path.basename(input_file.name))[0]
+    commands = Parser(input_file)
+    if constant_folder is not None:
+        commands = constant_folder.fold(commands)
+    translate_commands(commands, input_filename, output_file,
+                       bootstrap, shared_calls, shared_comparisons,
+                       cache_stack_top)
+
+
+def translate_commands(commands: typing.Iterable[Command], input_filename: str,
+                       output_file: typing.TextIO, bootstrap: bool,
+                       shared_calls: bool = False,
+                       shared_comparisons: bool = False,
+                       cache_stack_top: bool = False) -> None:
+    """
+    Translates the parsed commands of a single file to Hack assembly.
+
+    Args:
+        commands (typing.Iterable[Command]): The commands to translate.
+        input_filename (str): The name of the VM file, without its extension.
+        output_file (typing.TextIO): The output file where translated assembly code is written.
+        bootstrap (bool): If True, writes bootstrap code at the beginning.
+        shared_calls (bool): If True, calls and returns jump to shared
+            routines instead of being translated inline, see CodeWriter.
+        shared_comparisons (bool): If True, eq, lt and gt jump to shared
+            routines instead of being translated inline.
+        cache_stack_top (bool): If True, keep the top of the stack in D
+            across commands when possible.
+    """
+
+    code_writer = CodeWriter(output_file, shared_calls, shared_comparisons,
+                             cache_stack_top)
     code_writer.set_file_name(input_filename)
     cur_function = "Sys.init"
 
     if bootstrap:
         code_writer.bootstrap_write()
 
-    while parser.has_more_commands():
-        type = parser.command_type()  # Get the command type
+    for command in commands:
+        opcode = command.opcode
         suplement = cur_function
 
-        if type == "C_ARITHMETIC":
-            sub_type = parser.arg1()
-            str_to_send = suplement + "$"
-            code_writer.write_arithmetic(sub_type, str_to_send)
-        elif type == "C_PUSH":
-            arg1 = parser.arg1()
-            arg2 = parser.arg2()
-            code_writer.write_push_pop("C_PUSH", arg1, arg2)
-        elif type == "C_POP":
-            arg1 = parser.arg1()
-            arg2 = parser.arg2()
-            code_writer.write_push_pop("C_POP", arg1, arg2)
-        elif type == "C_GOTO":
-            arg1 = suplement + "$" + parser.arg1()
-            code_writer.write_goto(arg1)
-        elif type == "C_IF":
-            arg1 = suplement + "$" + parser.arg1()
-            code_writer.write_if(arg1)
-        elif type == "C_LABEL":
-            arg1 = suplement + "$" + parser.arg1()
-            code_writer.write_label(arg1)
-        elif type == "C_CALL":
-            arg1 = parser.arg1()
-            arg2 = parser.arg2()
-            code_writer.write_call(arg1, arg2)
-        elif type == "C_FUNCTION":
-            arg1 = parser.arg1()
-            cur_function = arg1
-            arg2 = parser.arg2()
-            code_writer.write_function(arg1, arg2)
-        elif type == "C_RETURN":
+        if opcode <= LAST_ARITHMETIC:
+            code_writer.write_arithmetic(COMMANDS[opcode], suplement + "$")
+        elif opcode == PUSH:
+            code_writer.write_push_pop("C_PUSH", SEGMENTS[command.segment],
+                                       command.index)
+        elif opcode == POP:
+            code_writer.write_push_pop("C_POP", SEGMENTS[command.segment],
+                                       command.index)
+        elif opcode == GOTO:
+            code_writer.write_goto(suplement + "$" + command.name)
+        elif opcode == IF_GOTO:
+            code_writer.write_if(suplement + "$" + command.name)
+        elif opcode == LABEL:
+            code_writer.write_label(suplement + "$" + command.name)
+        elif opcode == CALL:
+            code_writer.write_call(command.name, command.index)
+        elif opcode == FUNCTION:
+            cur_function = command.name
+            code_writer.write_function(command.name, command.index)
+        elif opcode == RETURN:
             code_writer.write_return()
 
-        parser.advance()
+    code_writer.flush_stack_top()
+    code_writer.write_out()
+
+
+def read_modules(input_paths: typing.Iterable[str]
+                 ) -> typing.List[typing.Tuple[str, typing.List[Command]]]:
+    """
+    Parses whole VM files, for the passes that need the whole program.
+
+    Args:
+        input_paths (typing.Iterable[str]): paths of the .vm files.
+
+    Returns:
+        typing.List[typing.Tuple[str, typing.List[Command]]]: the name of
+        every file, without its extension, and its commands.
+    """
+    modules = []
+    for input_path in input_paths:
+        with open(input_path, 'r') as input_file:
+            modules.append((os.path.splitext(os.path.basename(input_path))[0],
+                            list(Parser(input_file))))
+    return modules
+
+
+def eliminate_dead_functions(
+        modules: typing.List[typing.Tuple[str, typing.List[Command]]],
+        report: bool = True
+) -> typing.List[typing.Tuple[str, typing.List[Command]]]:
+    """
+    Drops the functions that cannot be reached from Sys.init, and reports
+    them to stderr. Programs without Sys.init are returned unchanged.
+
+    Args:
+        modules (typing.List[typing.Tuple[str, typing.List[Command]]]): the
+            program, as returned by read_modules.
+        report (bool): if False, nothing is printed.
+
+    Returns:
+        typing.List[typing.Tuple[str, typing.List[Command]]]: the program
+        without its dead functions.
+    """
+    graph = CallGraph(modules)
+    if "Sys.init" not in graph.calls:
+        if report:
+            print("No Sys.init, no functions dropped", file=sys.stderr)
+        return modules
+    live = graph.reachable()
+    dead = sorted(graph.calls.keys() - live)
+    if report:
+        print("Dropped %d of %d functions (%d VM commands)%s"
+              % (len(dead), len(graph.calls),
+                 sum(graph.sizes[function] for function in dead),
+                 ": " + ", ".join(dead) if dead else ""), file=sys.stderr)
+    return [(input_filename, list(CallGraph.live_commands(commands, live)))
+            for input_filename, commands in modules]
+
+
+def simplify_program(
+        modules: typing.List[typing.Tuple[str, typing.List[Command]]],
+        constant_folder: typing.Optional[ConstantFolder],
+        eliminate: bool, report: bool = True
+) -> typing.List[typing.Tuple[str, typing.List[Command]]]:
+    """
+    Runs the passes that come after inlining on a whole program.
+
+    Args:
+        modules (typing.List[typing.Tuple[str, typing.List[Command]]]): the
+            program, as returned by read_modules.
+        constant_folder (typing.Optional[ConstantFolder]): if given, the
+            commands of every file are simplified by it.
+        eliminate (bool): if True, drop the functions Sys.init never calls.
+        report (bool): see eliminate_dead_functions.
+
+    Returns:
+        typing.List[typing.Tuple[str, typing.List[Command]]]: the simplified
+        program.
+    """
+    if constant_folder is not None:
+        modules = [(input_filename, list(constant_folder.fold(commands)))
+                   for input_filename, commands in modules]
+    if eliminate:
+        modules = eliminate_dead_functions(modules, report)
+    return modules
+
+
+def translate_program(
+        modules: typing.List[typing.Tuple[str, typing.List[Command]]],
+        output_file: typing.TextIO, options: typing.Dict[str, bool]) -> int:
+    """
+    Translates a whole program, with the bootstrap code first.
+
+    Args:
+        modules (typing.List[typing.Tuple[str, typing.List[Command]]]): the
+            program, as returned by read_modules.
+        output_file (typing.TextIO): where the assembly code is written.
+        options (typing.Dict[str, bool]): the options of translate_commands.
+
+    Returns:
+        int: the number of Hack instructions written.
+    """
+    buffer = io.StringIO()
+    bootstrap = True
+    for input_filename, commands in modules:
+        translate_commands(commands, input_filename, buffer, bootstrap,
+                           **options)
+        bootstrap = False
+    code = buffer.getvalue()
+    output_file.write(code)
+    return sum(1 for line in code.splitlines()
+               if line and not line.startswith(("(", "//")))
+
+
+def rom_size(modules: typing.List[typing.Tuple[str, typing.List[Command]]],
+             options: typing.Dict[str, bool]) -> int:
+    """
+    Translates a program in memory, and leaves the label counters of
+    CodeWriter as they were, so the real translation is not affected.
+
+    Args:
+        modules (typing.List[typing.Tuple[str, typing.List[Command]]]): the
+            program, as returned by read_modules.
+        options (typing.Dict[str, bool]): the options of translate_commands.
+
+    Returns:
+        int: the number of Hack instructions of the program.
+    """
+    counters = CodeWriter.label_count, CodeWriter.call_counter
+    size = translate_program(modules, io.StringIO(), options)
+    CodeWriter.label_count, CodeWriter.call_counter = counters
+    return size
 
 
 if "__main__" == __name__:
@@ -77,9 +239,36 @@ if "__main__" == __name__:
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: VMtranslator <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    # With --inline or --eliminate-dead-functions, the whole program is
+    # parsed first. Small leaf functions are inlined into their callers, and
+    # then only the functions that Sys.init can still reach are translated.
+    # --fold-constants simplifies the commands of every file, after inlining.
+    # The ROM size reported for --inline is that of the final program, and it
+    # is compared with the same program simplified without inlining.
+    arg_parser = argparse.ArgumentParser(
+        prog="VMtranslator",
+        usage="VMtranslator [--shared-calls] [--shared-comparisons] "
+              "[--cache-stack-top] [--eliminate-dead-functions] "
+              "[--inline] [--inline-size N] [--fold-constants] "
+              "<input path>")
+    arg_parser.add_argument("path")
+    arg_parser.add_argument("--shared-calls", action="store_true",
+                            help="share one call and one return routine")
+    arg_parser.add_argument("--shared-comparisons", action="store_true",
+                            help="share one routine for each of eq, lt, gt")
+    arg_parser.add_argument("--cache-stack-top", action="store_true",
+                            help="keep the top of the stack in D")
+    arg_parser.add_argument("--eliminate-dead-functions", action="store_true",
+                            help="drop functions Sys.init never calls")
+    arg_parser.add_argument("--inline", action="store_true",
+                            help="inline small leaf functions")
+    arg_parser.add_argument("--inline-size", type=int, default=12,
+                            metavar="N",
+                            help="inline functions of up to N commands")
+    arg_parser.add_argument("--fold-constants", action="store_true",
+                            help="fold arithmetic on constants")
+    args = arg_parser.parse_args()
+    argument_path = os.path.abspath(args.path)
     if os.path.isdir(argument_path):
         files_to_translate = [
             os.path.join(argument_path, filename)
@@ -90,12 +279,36 @@ if "__main__" == __name__:
         files_to_translate = [argument_path]
         output_path, extension = os.path.splitext(argument_path)
     output_path += ".asm"
+    files_to_translate = [
+        input_path for input_path in files_to_translate
+        if os.path.splitext(input_path)[1].lower() == ".vm"]
+    options = {"shared_calls": args.shared_calls,
+               "shared_comparisons": args.shared_comparisons,
+               "cache_stack_top": args.cache_stack_top}
+    constant_folder = ConstantFolder() if args.fold_constants else None
     bootstrap = True
     with open(output_path, 'w') as output_file:
-        for input_path in files_to_translate:
-            filename, extension = os.path.splitext(input_path)
-            if extension.lower() != ".vm":
-                continue
-            with open(input_path, 'r') as input_file:
-                translate_file(input_file, output_file, bootstrap)
-            bootstrap = False
+        if args.inline or args.eliminate_dead_functions:
+            modules = read_modules(files_to_translate)
+            if args.inline:
+                inliner = Inliner(args.inline_size)
+                before = rom_size(simplify_program(
+                    modules,
+                    ConstantFolder() if constant_folder is not None else None,
+                    args.eliminate_dead_functions, report=False), options)
+                modules = inliner.inline(modules)
+            modules = simplify_program(modules, constant_folder,
+                                       args.eliminate_dead_functions)
+            after = translate_program(modules, output_file, options)
+            if args.inline:
+                print("%s, ROM %d -> %d (%+d)" % (inliner.report(), before,
+                                                  after, after - before),
+                      file=sys.stderr)
+        else:
+            for input_path in files_to_translate:
+                with open(input_path, 'r') as input_file:
+                    translate_file(input_file, output_file, bootstrap,
+                                   constant_folder=constant_folder, **options)
+                bootstrap = False
+    if constant_folder is not None:
+        print(constant_folder.report(), file=sys.stderr)
@@ -7,6 +7,76 @@ Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
 import typing
 
+# The VM commands, indexed by their opcodes.
+COMMANDS = ("add", "sub", "neg", "eq", "gt", "lt", "and", "or", "not",
+            "shiftLeft", "shiftRight", "push", "pop", "label", "goto",
+            "if-goto", "function", "call", "return")
+(ADD, SUB, NEG, EQ, GT, LT, AND, OR, NOT, SHIFT_LEFT, SHIFT_RIGHT, PUSH, POP,
+ LABEL, GOTO, IF_GOTO, FUNCTION, CALL, RETURN) = range(len(COMMANDS))
+
+# Opcodes up to this one are arithmetic commands.
+LAST_ARITHMETIC = SHIFT_RIGHT
+
+# The command type of every opcode, as returned by Parser.command_type.
+COMMAND_TYPES = ("C_ARITHMETIC",) * (LAST_ARITHMETIC + 1) + (
+    "C_PUSH", "C_POP", "C_LABEL", "C_GOTO", "C_IF", "C_FUNCTION", "C_CALL",
+    "C_RETURN")
+
+OPCODES = {command: opcode for opcode, command in enumerate(COMMANDS)}
+OPCODES["shiftleft"] = SHIFT_LEFT
+OPCODES["shiftright"] = SHIFT_RIGHT
+
+# The memory segments, indexed by their codes.
+SEGMENTS = ("argument", "local", "static", "constant", "this", "that",
+            "pointer", "temp")
+ARGUMENT, LOCAL, STATIC, CONSTANT, THIS, THAT, POINTER, TEMP = \
+    range(len(SEGMENTS))
+
+SEGMENT_CODES = {segment: code for code, segment in enumerate(SEGMENTS)}
+
+
+class Command:
+    """A single tokenized VM command.
+
+    Attributes:
+        opcode (int): one of the opcodes, such as ADD or PUSH.
+        segment (int): the segment code of push and pop, None otherwise.
+        index (int): the index of push and pop, the n-vars of function and
+            the n-args of call, 0 otherwise.
+        name (str): the label of label, goto and if-goto, the function name
+            of function and call, None otherwise.
+    """
+    __slots__ = ("opcode", "segment", "index", "name")
+
+    def __init__(self, opcode: int, segment: typing.Optional[int] = None,
+                 index: int = 0, name: typing.Optional[str] = None) -> None:
+        self.opcode = opcode
+        self.segment = segment
+        self.index = index
+        self.name = name
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Command) and \
+            (self.opcode, self.segment, self.index, self.name) == \
+            (other.opcode, other.segment, other.index, other.name)
+
+    def __repr__(self) -> str:
+        return "Command(" + repr(self.text()) + ")"
+
+    def text(self) -> str:
+        """
+        Returns:
+            str: the command in VM syntax.
+        """
+        command = COMMANDS[self.opcode]
+        if self.segment is not None:
+            return "%s %s %d" % (command, SEGMENTS[self.segment], self.index)
+        if self.opcode in (FUNCTION, CALL):
+            return "%s %s %d" % (command, self.name, self.index)
+        if self.name is not None:
+            return command + " " + self.name
+        return command
+
 
 class Parser:
     """
@@ -17,6 +87,10 @@ class Parser:
     access to their components. 
     In addition, it removes all white space and comments.
 
+    Every line is tokenized exactly once, into a Command record. The input is
+    consumed lazily, and iterating over the parser yields the records of all
+    the remaining commands.
+
     ## VM Language Specification
 
     A .vm file is a stream of characters. If the file represents a
@@ -46,16 +120,71 @@ class Parser:
       - return
     """
 
-    def __init__(self, input_file: typing.TextIO) -> None:
+    def __init__(self, input_file: typing.Iterable[str]) -> None:
         """Gets ready to parse the input file.
 
         Args:
-            input_file (typing.TextIO): input file.
+            input_file (typing.Iterable[str]): input file, or any other
+                iterable of source lines.
+        """
+        self.__commands = self.parse_lines(input_file)
+        self.__cur_command = next(self.__commands, None)
+
+    def __iter__(self) -> typing.Iterator[Command]:
+        """Yields the current command and every command after it."""
+        while self.__cur_command is not None:
+            yield self.__cur_command
+            self.advance()
+
+    @staticmethod
+    def parse_lines(lines: typing.Iterable[str]) -> typing.Iterator[Command]:
+        """Yields a Command for every command in the given lines, skipping
+        white space and comments.
+
+        Args:
+            lines (typing.Iterable[str]): VM source lines.
+        """
+        parse_line = Parser.parse_line
+        for line in lines:
+            command = parse_line(line)
+            if command is not None:
+                yield command
+
+    @staticmethod
+    def parse_line(line: str) -> typing.Optional[Command]:
+        """Tokenizes a single line of VM code.
+
+        Args:
+            line (str): a line of VM code.
+
+        Returns:
+            Command: the command on the line, or None if the line holds only
+            white space and comments.
         """
-        self.__input_lines = input_file.read().splitlines()
-        self.__counter = 0
-        self.__num_of_lines = len(self.__input_lines)
-        self.__cur_line = self.__input_lines[0]
+        ind_comment = line.find("//")
+        if ind_comment != -1:
+            line = line[:ind_comment]
+        tokens = line.split()
+        if not tokens:
+            return None
+        opcode = OPCODES.get(tokens[0])
+        try:
+            if opcode is None:
+                raise ValueError
+            if opcode <= LAST_ARITHMETIC or opcode == RETURN:
+                if len(tokens) != 1:
+                    raise ValueError
+                return Command(opcode)
+            if opcode == PUSH or opcode == POP:
+                segment, index = tokens[1:]
+                return Command(opcode, SEGMENT_CODES[segment], int(index))
+            if opcode == FUNCTION or opcode == CALL:
+                name, count = tokens[1:]
+                return Command(opcode, index=int(count), name=name)
+            label, = tokens[1:]
+            return Command(opcode, name=label)
+        except (KeyError, ValueError):
+            raise ValueError("Invalid VM command: " + line.strip()) from None
 
     def has_more_commands(self) -> bool:
         """Checks if there are more commands in the input.
@@ -63,18 +192,22 @@ class Parser:
         Returns:
             bool: True if there are more commands, False otherwise.
         """
-        return self.__counter < self.__num_of_lines
+        return self.__cur_command is not None
 
     def advance(self) -> None:
         """Advances to the next command in the input.
 
         Reads the next command from the input and makes it the current command.
         Should be called only if has_more_commands() is True.
-        Initially, there is no current command.
         """
-        self.__counter += 1
-        if self.has_more_commands():
-            self.__cur_line = self.__input_lines[self.__counter]
+        self.__cur_command = next(self.__commands, None)
+
+    def command(self) -> Command:
+        """
+        Returns:
+            Command: the current command, already tokenized.
+        """
+        return self.__cur_command
 
     def command_type(self) -> str:
         """
@@ -91,41 +224,8 @@ class Parser:
                 - "C_FUNCTION"
                 - "C_RETURN"
                 - "C_CALL"
-                - "null" (for empty lines or comments)
         """
-
-        if self.__cur_line == "":
-            return "null"
-        elif self.__cur_line[0] == "/":
-            return "null"
-
-        # Remove leading spaces
-        while self.__cur_line[0] == " ":
-            self.__cur_line = self.__cur_line[1:]
-
-        # Check if it is an arithmetic command
-        if self.__cur_line.startswith((
-                "add", "sub", "neg", "eq", "gt", "lt", "and", "or", "not", "shiftLeft", "shiftRight"
-        )):
-            return "C_ARITHMETIC"
-
-        # Check for command types
-        elif self.__cur_line.startswith("pop"):
-            return "C_POP"
-        elif self.__cur_line.startswith("push"):
-            return "C_PUSH"
-        elif self.__cur_line.startswith("label"):
-            return "C_LABEL"
-        elif self.__cur_line.startswith("goto"):
-            return "C_GOTO"
-        elif self.__cur_line.startswith("if-goto"):
-            return "C_IF"
-        elif self.__cur_line.startswith("call"):
-            return "C_CALL"
-        elif self.__cur_line.startswith("function"):
-            return "C_FUNCTION"
-        elif self.__cur_line.startswith("return"):
-            return "C_RETURN"
+        return COMMAND_TYPES[self.__cur_command.opcode]
 
     def arg1(self) -> str:
         """
@@ -136,13 +236,12 @@ class Parser:
                  "C_ARITHMETIC", it returns the command itself. This method
                  should not be called if the command type is "C_RETURN".
         """
-
-        if self.command_type() == "C_ARITHMETIC":
-            return self.__cur_line.split()[0]
-        elif self.command_type() == "C_RETURN":
-            return ""
-        else:
-            return self.__cur_line.split(" ")[1]
+        command = self.__cur_command
+        if command.opcode <= LAST_ARITHMETIC:
+            return COMMANDS[command.opcode]
+        if command.segment is not None:
+            return SEGMENTS[command.segment]
+        return command.name or ""
 
     def arg2(self) -> int:
         """
@@ -153,7 +252,4 @@ class Parser:
                  only be called if the command type is "C_PUSH", "C_POP",
                  "C_FUNCTION", or "C_CALL".
         """
-
-        if self.command_type() in ["C_PUSH", "C_POP", "C_FUNCTION", "C_CALL"]:
-            return int(self.__cur_line.split(" ")[2])
-        return 0
+        return self.__cur_command.index
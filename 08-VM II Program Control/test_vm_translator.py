@@ -0,0 +1,557 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import typing
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+PREDEFINED_SYMBOLS = {"SP": 0, "LCL": 1, "ARG": 2, "THIS": 3, "THAT": 4,
+                      "SCREEN": 16384, "KBD": 24576}
+PREDEFINED_SYMBOLS.update(("R%d" % index, index) for index in range(16))
+
+# Whether each jump is taken, given the result of the comp.
+CONDITIONS = {
+    "JGT": lambda out: out > 0,
+    "JEQ": lambda out: out == 0,
+    "JGE": lambda out: out >= 0,
+    "JLT": lambda out: out < 0,
+    "JNE": lambda out: out != 0,
+    "JLE": lambda out: out <= 0,
+    "JMP": lambda out: True,
+}
+
+# Small programs, as the contents of their .vm files. Their results are
+# stored in static variables and on the heap.
+PROGRAMS = {
+    "Calls": {
+        "Sys.vm": """
+            // Calls, recursion, and the pointers and statics of callees.
+            function Sys.init 0
+                push constant 10
+                call Main.fib 1
+                pop static 0
+                push constant 7
+                push constant 9
+                call Main.mul 2
+                pop static 1
+                push constant 5
+                neg
+                call Util.abs 1
+                pop static 2
+                push constant 3000
+                pop pointer 0
+                push constant 42
+                call Util.setField 1
+                pop temp 7
+                call Util.getField 0
+                pop static 3
+                call Util.counter 0
+                pop static 4
+                call Util.counter 0
+                pop static 5
+                push constant 4000
+                pop pointer 0
+                push constant 3100
+                call Util.setThis 1
+                pop temp 0
+                push pointer 0
+                pop static 6
+            label HALT
+                goto HALT
+        """,
+        "Main.vm": """
+            function Main.fib 0
+                push argument 0
+                push constant 2
+                lt
+                if-goto BASE
+                push argument 0
+                push constant 1
+                sub
+                call Main.fib 1
+                push argument 0
+                push constant 2
+                sub
+                call Main.fib 1
+                add
+                return
+            label BASE
+                push argument 0
+                return
+            function Main.mul 2
+                push constant 0
+                pop local 0
+                push argument 1
+                pop local 1
+            label LOOP
+                push local 1
+                push constant 0
+                eq
+                if-goto END
+                push local 0
+                push argument 0
+                add
+                pop local 0
+                push local 1
+                push constant 1
+                sub
+                pop local 1
+                goto LOOP
+            label END
+                push local 0
+                return
+        """,
+        "Util.vm": """
+            function Util.abs 0
+                push argument 0
+                push constant 0
+                lt
+                if-goto NEG
+                push argument 0
+                return
+            label NEG
+                push argument 0
+                neg
+                return
+            function Util.setField 0
+                push argument 0
+                pop this 1
+                push constant 0
+                return
+            function Util.getField 0
+                push this 1
+                return
+            function Util.counter 0
+                push static 0
+                push constant 1
+                add
+                pop static 0
+                push static 0
+                return
+            function Util.setThis 0
+                push argument 0
+                pop pointer 0
+                push constant 11
+                pop this 0
+                push constant 0
+                return
+            function Util.unused 0
+                push constant 99
+                call Util.unused2 0
+                return
+            function Util.unused2 0
+                push constant 1
+                return
+        """,
+    },
+    "Segments": {
+        "Sys.vm": """
+            // Comparisons at the edges of the range, and every segment.
+            function Sys.init 0
+                push constant 1
+                push constant 2
+                push constant 3
+                call Sys.sum 3
+                pop static 0
+                push constant 32767
+                neg
+                push constant 1
+                sub
+                pop temp 0
+                push temp 0
+                push constant 100
+                lt
+                pop static 1
+                push constant 32767
+                push temp 0
+                gt
+                pop static 2
+                push temp 0
+                push temp 0
+                eq
+                pop static 3
+                push constant 3010
+                pop pointer 1
+                push constant 77
+                pop that 3
+                push that 3
+                push constant 1
+                add
+                pop that 4
+                push constant 3000
+                pop pointer 0
+                push constant 111
+                pop this 9
+                push this 9
+                push that 4
+                add
+                pop static 4
+            label END
+                goto END
+            function Sys.sum 12
+                push argument 0
+                pop local 0
+                push argument 2
+                pop local 11
+                push local 0
+                push local 11
+                add
+                push argument 1
+                add
+                pop temp 6
+                push temp 6
+                return
+        """,
+    },
+    "Labels": {
+        "Sys.vm": """
+            // A callee that returns early and has a label named END.
+            function Sys.init 0
+                push constant 1
+                call Sys.pick 1
+                pop static 0
+                push constant 0
+                call Sys.pick 1
+                pop static 1
+            label END
+                goto END
+            function Sys.pick 0
+                push argument 0
+                if-goto END
+                push constant 111
+                return
+            label END
+                push constant 222
+                return
+        """,
+    },
+    "Constants": {
+        "Sys.vm": """
+            // Arithmetic on constants, which overflows, and identities.
+            function Sys.init 0
+                push constant 32767
+                push constant 1
+                add
+                pop static 0
+                push constant 5
+                push constant 9
+                sub
+                pop static 1
+                push constant 7
+                neg
+                not
+                pop static 2
+                push constant 3
+                push constant 3
+                eq
+                push constant 2
+                push constant 3
+                gt
+                or
+                pop static 3
+                push constant 2
+                push constant 3
+                lt
+                pop static 4
+                push static 1
+                push constant 0
+                add
+                pop static 5
+                push static 1
+                push constant 0
+                not
+                and
+                pop static 6
+                push static 2
+                neg
+                neg
+                pop static 7
+                push constant 12
+                push constant 10
+                and
+                push constant 1
+                or
+                pop static 8
+                push static 0
+                push constant 1
+                sub
+                pop static 9
+                push constant 4
+                push constant 4
+                lt
+                push constant 4
+                push constant 4
+                gt
+                or
+                pop static 10
+                push constant 3000
+                pop pointer 1
+                push constant 100
+                push constant 28
+                push constant 2
+                sub
+                add
+                pop that 0
+            label END
+                goto END
+        """,
+    },
+}
+
+
+def generate_expressions(seed: int, count: int = 25) -> str:
+    """Generates a Sys.vm that stores random expressions on constants and
+    statics in statics, for the constant folder.
+
+    Args:
+        seed (int): the seed of the generator.
+        count (int): the number of expressions.
+
+    Returns:
+        str: the contents of the file.
+    """
+    generator = random.Random(seed)
+
+    def expression(depth: int) -> typing.List[str]:
+        draw = generator.random()
+        if depth == 0 or draw < 0.25:
+            if generator.random() < 0.2:
+                return ["push static %d" % generator.randrange(count)]
+            return ["push constant %d" % generator.choice(
+                (0, 1, 2, 3, 7, 100, 255, 16384, 32767,
+                 generator.randrange(32768)))]
+        if draw < 0.45:
+            return expression(depth - 1) + [generator.choice(("neg", "not"))]
+        return expression(depth - 1) + expression(depth - 1) + [
+            generator.choice(("add", "sub", "and", "or", "eq", "gt", "lt"))]
+
+    lines = ["function Sys.init 0"]
+    for index in range(count):
+        lines += expression(4) + ["pop static %d" % index]
+    lines += ["label END", "goto END"]
+    return "\n".join(lines) + "\n"
+
+
+PROGRAMS["Expressions"] = {"Sys.vm": generate_expressions(0)}
+
+
+def load(asm: str) -> typing.Tuple[typing.List[tuple],
+                                   typing.Dict[str, int]]:
+    """Assembles a program for run.
+
+    Args:
+        asm (str): the program, in Hack assembly.
+
+    Returns:
+        typing.Tuple[typing.List[tuple], typing.Dict[str, int]]: the
+        instructions, each an ("@", value) or a (comp, dest, jump) tuple,
+        and the address of every variable.
+    """
+    lines = []
+    labels = {}
+    for line in asm.splitlines():
+        line = line.split("//")[0].strip()
+        if line.startswith("("):
+            labels[line[1:-1]] = len(lines)
+        elif line:
+            lines.append(line)
+    variables = {}
+    program = []
+    for line in lines:
+        if line.startswith("@"):
+            symbol = line[1:]
+            if symbol.isdigit():
+                value = int(symbol)
+            elif symbol in PREDEFINED_SYMBOLS:
+                value = PREDEFINED_SYMBOLS[symbol]
+            elif symbol in labels:
+                value = labels[symbol]
+            else:
+                value = variables.setdefault(symbol, 16 + len(variables))
+            program.append(("@", value))
+            continue
+        dest, _, comp = line.rpartition("=")
+        comp, _, jump = comp.partition(";")
+        if comp.endswith(("<<", ">>")):
+            comp += "1"
+        program.append((eval("lambda A, M, D: " + comp.replace("!", "~")),
+                        dest, CONDITIONS.get(jump)))
+    return program, variables
+
+
+def run(asm: str, max_cycles: int = 2000000) -> typing.Dict[str, int]:
+    """Runs a program until it reaches a loop that jumps to itself, such as
+    the one a VM "label END, goto END" is translated to.
+
+    Args:
+        asm (str): the program, in Hack assembly.
+        max_cycles (int): the program fails if it runs any longer.
+
+    Returns:
+        typing.Dict[str, int]: the nonzero variables of the program, by
+        name, and the nonzero words of the heap, by address.
+    """
+    program, variables = load(asm)
+    ram = {0: 0}
+    a = d = pc = 0
+    for _ in range(max_cycles):
+        instruction = program[pc]
+        if instruction[0] == "@":
+            if instruction[1] == pc and program[pc + 1][0] != "@" \
+                    and program[pc + 1][2] is not None:
+                break
+            a = instruction[1]
+            pc += 1
+            continue
+        comp, dest, jump = instruction
+        out = comp(a, ram.get(a, 0), d) & 0xFFFF
+        out = out - 0x10000 if out & 0x8000 else out
+        address = a
+        if "M" in dest:
+            ram[address] = out
+        if "D" in dest:
+            d = out
+        if "A" in dest:
+            a = out & 0x7FFF
+        pc = address if jump is not None and jump(out) else pc + 1
+    else:
+        raise AssertionError("The program did not halt")
+    results = {name: ram[address] for name, address in variables.items()
+               if ram.get(address)}
+    results.update((address, value) for address, value in ram.items()
+                   if address >= 2048 and value)
+    return results
+
+
+def translate(name: str, *options: str) -> str:
+    """Translates one of the PROGRAMS with the VM translator.
+
+    Args:
+        name (str): the name of the program.
+        *options (str): command line options of the translator.
+
+    Returns:
+        str: the translated program.
+    """
+    return translate_with_messages(name, *options)[0]
+
+
+def translate_with_messages(name: str, *options: str
+                            ) -> typing.Tuple[str, str]:
+    """
+    Args:
+        name (str): the name of the program.
+        *options (str): command line options of the translator.
+
+    Returns:
+        typing.Tuple[str, str]: the translated program, and what the
+        translator printed to stderr.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        program_dir = os.path.join(temp_dir, name)
+        os.mkdir(program_dir)
+        for filename, source in PROGRAMS[name].items():
+            with open(os.path.join(program_dir, filename), 'w') as vm_file:
+                vm_file.write(source)
+        process = subprocess.run(
+            [sys.executable, os.path.join(HERE, "Main.py")] + list(options)
+            + [program_dir], check=True, capture_output=True, text=True)
+        with open(os.path.join(program_dir, name + ".asm"), 'r') as asm_file:
+            return asm_file.read(), process.stderr
+
+
+class TranslatorTest(unittest.TestCase):
+    """Every option of the translator leaves the results of the programs as
+    they are without it."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.expected = {name: run(translate(name)) for name in PROGRAMS}
+
+    def assert_same_results(self, *options: str) -> None:
+        for name in PROGRAMS:
+            with self.subTest(program=name):
+                self.assertEqual(run(translate(name, *options)),
+                                 self.expected[name])
+
+    def test_results(self) -> None:
+        self.assertEqual(self.expected["Calls"], {
+            "Sys.0": 55, "Sys.1": 63, "Sys.2": 5, "Sys.3": 42, "Util.0": 2,
+            "Sys.4": 1, "Sys.5": 2, "Sys.6": 4000, 3001: 42, 3100: 11})
+        self.assertEqual(self.expected["Segments"], {
+            "Sys.0": 6, "Sys.1": -1, "Sys.2": -1, "Sys.3": -1, "Sys.4": 189,
+            3013: 77, 3014: 78, 3009: 111})
+
+    def test_shared_calls(self) -> None:
+        self.assert_same_results("--shared-calls")
+
+    def test_shared_comparisons(self) -> None:
+        self.assert_same_results("--shared-comparisons")
+
+    def test_cache_stack_top(self) -> None:
+        self.assert_same_results("--cache-stack-top")
+
+    def test_eliminate_dead_functions(self) -> None:
+        self.assert_same_results("--eliminate-dead-functions")
+        self.assert_same_results("--eliminate-dead-functions",
+                                 "--shared-calls", "--cache-stack-top")
+        asm = translate("Calls", "--eliminate-dead-functions")
+        self.assertNotIn("(Util.unused)", asm)
+        self.assertNotIn("(Util.unused2)", asm)
+        self.assertIn("(Util.abs)", asm)
+
+    def test_inline(self) -> None:
+        self.assert_same_results("--inline")
+        self.assert_same_results("--inline", "--inline-size", "100")
+        self.assert_same_results("--inline", "--eliminate-dead-functions",
+                                 "--shared-calls", "--shared-comparisons")
+        # Every call of these leaf functions is inlined, so they are dead.
+        asm = translate("Calls", "--inline", "--eliminate-dead-functions")
+        for function in ("Util.abs", "Util.setField", "Util.getField",
+                         "Util.setThis"):
+            self.assertNotIn("(" + function + ")", asm)
+        self.assertIn("(Main.fib)", asm)
+        self.assertEqual(self.expected["Labels"], {"Sys.0": 222, "Sys.1": 111})
+        asm = translate("Labels", "--inline", "--eliminate-dead-functions")
+        self.assertNotIn("(Sys.pick)", asm)
+
+    def test_inline_report(self) -> None:
+        # The reported size is that of the program written.
+        for options in (("--inline",),
+                        ("--inline", "--eliminate-dead-functions")):
+            with self.subTest(options=options):
+                asm, messages = translate_with_messages("Calls", *options)
+                instructions = len(load(asm)[0])
+                self.assertRegex(messages, r"ROM \d+ -> %d \(" % instructions)
+
+    def test_fold_constants(self) -> None:
+        self.assert_same_results("--fold-constants")
+        self.assert_same_results("--fold-constants", "--cache-stack-top")
+        self.assert_same_results("--fold-constants", "--inline",
+                                 "--eliminate-dead-functions")
+        self.assert_same_results("--fold-constants", "--inline",
+                                 "--eliminate-dead-functions",
+                                 "--shared-calls", "--shared-comparisons",
+                                 "--cache-stack-top")
+        self.assertEqual(self.expected["Constants"], {
+            "Sys.0": -32768, "Sys.1": -4, "Sys.2": 6, "Sys.3": -1,
+            "Sys.4": -1, "Sys.5": -4, "Sys.6": -4, "Sys.7": 6, "Sys.8": 9,
+            "Sys.9": 32767, 3000: 126})
+        for name in ("Constants", "Expressions"):
+            with self.subTest(program=name):
+                self.assertLess(len(translate(name, "--fold-constants")),
+                                len(translate(name)))
+
+
+if "__main__" == __name__:
+    unittest.main()